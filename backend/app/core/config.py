@@ -4,8 +4,96 @@ from dotenv import load_dotenv
 load_dotenv(override=True)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# URL for the asyncio engine; derived from DATABASE_URL when not set
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
 SECRET_KEY = os.getenv("SECRET_KEY")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 ALGORITHM = "HS256"
 # if not DATABASE_URL:
 #     raise ValueError("DATABASE_URL environment variable is not set. Please set it in your .env file.")
+
+# Connection pools: the sync engine serves the threadpool routes, the async
+# engine the event loop (webhook, worker, auth), which runs many more
+# concurrent queries
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# bcrypt cost factor; existing hashes are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads dedicated to bcrypt and how many operations may wait for them
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+# Cache of authenticated users resolved from JWTs
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+# Local snapshot of the market listing and how often it is re-downloaded, in seconds
+SYMBOL_SNAPSHOT_PATH = os.getenv("SYMBOL_SNAPSHOT_PATH", "data/symbols.json")
+SYMBOL_REFRESH_SECONDS = float(os.getenv("SYMBOL_REFRESH_SECONDS", "86400"))
+
+# Shared cache in front of vnstock Quote calls
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "5"))
+QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "512"))
+
+# Local on-disk candle archive; per-month compaction kicks in past this many segments
+CANDLE_STORE_PATH = os.getenv("CANDLE_STORE_PATH", "data/candles")
+CANDLE_STORE_COMPACT_SEGMENTS = int(os.getenv("CANDLE_STORE_COMPACT_SEGMENTS", "64"))
+# Seconds between writes of the buffered candles to the archive
+CANDLE_STORE_FLUSH_SECONDS = float(os.getenv("CANDLE_STORE_FLUSH_SECONDS", "300"))
+
+# Price board: row cache TTL, coalescing window (seconds) and symbols per upstream call
+PRICE_BOARD_TTL = float(os.getenv("PRICE_BOARD_TTL", "3"))
+PRICE_BOARD_WINDOW = float(os.getenv("PRICE_BOARD_WINDOW", "0.05"))
+PRICE_BOARD_BATCH_SIZE = int(os.getenv("PRICE_BOARD_BATCH_SIZE", "50"))
+PRICE_BOARD_CACHE_SIZE = int(os.getenv("PRICE_BOARD_CACHE_SIZE", "2000"))
+PRICE_BOARD_MAX_SYMBOLS = int(os.getenv("PRICE_BOARD_MAX_SYMBOLS", "500"))
+
+# Live streaming: poll interval per symbol, messages buffered per client, SSE keep-alive
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "5"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+STREAM_MAX_SYMBOLS = int(os.getenv("STREAM_MAX_SYMBOLS", "50"))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+# Indicators whose divergences are alerted on, "NAME[:lower:upper],..." (see app/utils/indicators.py)
+DIVERGENCE_INDICATORS = os.getenv("DIVERGENCE_INDICATORS", "RSI")
+# Cache of computed indicator columns per candle batch
+INDICATOR_CACHE_TTL = float(os.getenv("INDICATOR_CACHE_TTL", "30"))
+INDICATOR_CACHE_SIZE = int(os.getenv("INDICATOR_CACHE_SIZE", "2048"))
+
+# Full rebuild interval of the worker's symbol -> subscribers index, in seconds
+SUBSCRIPTION_REFRESH_SECONDS = float(os.getenv("SUBSCRIPTION_REFRESH_SECONDS", "300"))
+
+# Threads the worker uses for blocking fetch/analysis work
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+# Higher timeframes the worker also detects divergences on, built from the 1m candles
+WORKER_TIMEFRAMES = os.getenv("WORKER_TIMEFRAMES", "5m,15m")
+# Worker cadence while the market is open: seconds between polls, aligned to bar
+# closes, and how long after a close to poll so the bar is final upstream
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "60"))
+WORKER_POLL_DELAY = float(os.getenv("WORKER_POLL_DELAY", "2"))
+
+# Market calendar: exchanges whose sessions the pollers follow (HOSE, HNX, UPCOM)
+MARKET_EXCHANGES = os.getenv("MARKET_EXCHANGES", "HOSE,HNX,UPCOM")
+# Comma separated YYYY-MM-DD market holidays or YYYY-MM-DD..YYYY-MM-DD ranges;
+# replaces the built-in list (which ends with 2026) when set
+MARKET_HOLIDAYS = os.getenv("MARKET_HOLIDAYS", "")
+# Poll only while the market is in session; disable to poll around the clock (development)
+MARKET_HOURS_ONLY = os.getenv("MARKET_HOURS_ONLY", "true").lower() in ("1", "true", "yes")
+# Upstream vnstock requests per second allowed for each source, and burst size
+VNSTOCK_RATE_LIMIT = float(os.getenv("VNSTOCK_RATE_LIMIT", "5"))
+VNSTOCK_RATE_BURST = float(os.getenv("VNSTOCK_RATE_BURST", "10"))
+
+# Telegram delivery queue; the defaults follow Telegram's documented bot limits
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_WORKERS = int(os.getenv("TELEGRAM_WORKERS", "8"))
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", "10000"))
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+# Seconds shutdown waits for pending Telegram messages before dropping them
+TELEGRAM_STOP_TIMEOUT = float(os.getenv("TELEGRAM_STOP_TIMEOUT", "10"))
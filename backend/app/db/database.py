@@ -1,7 +1,69 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.core.config import DATABASE_URL
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.utils.metrics import Counter, Gauge, db_pool_checkout_seconds
+from app.core.config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, ASYNC_DB_POOL_SIZE,
+    ASYNC_DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+)
+
+# libpq query parameters asyncpg knows under another name; the other
+# libpq-only ones make asyncpg fail on connect and are dropped
+ASYNCPG_PARAMS = {"sslmode": "ssl"}
+LIBPQ_ONLY_PARAMS = {
+    "sslcert", "sslkey", "sslrootcert", "sslcrl", "sslpassword", "sslcompression",
+    "channel_binding", "gssencmode", "krbsrvname", "requirepeer", "application_name",
+    "fallback_application_name", "keepalives", "keepalives_idle", "keepalives_interval",
+    "keepalives_count", "options", "tcp_user_timeout", "client_encoding",
+}
+
+def to_async_url(url: str) -> str:
+    """
+    Swap the sync driver of DATABASE_URL for its asyncio counterpart.
+
+    For Postgres the libpq query parameters are translated for asyncpg
+    (sslmode=require -> ssl=require; connect_timeout goes through
+    async_connect_args) and the ones asyncpg doesn't accept are dropped;
+    set ASYNC_DATABASE_URL when they matter (e.g. client certificates).
+    """
+    parsed = make_url(url)
+    dialect = parsed.drivername.split("+", 1)[0]
+    if dialect in ("postgresql", "postgres"):
+        query = {}
+        for name, value in parsed.query.items():
+            if name == "connect_timeout":
+                continue
+            if name in LIBPQ_ONLY_PARAMS:
+                print(f"Ignoring {name} in DATABASE_URL for the async engine (not supported by asyncpg)")
+                continue
+            query[ASYNCPG_PARAMS.get(name, name)] = value
+        parsed = parsed.set(drivername="postgresql+asyncpg", query=query)
+    elif dialect == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    else:
+        return url
+    return parsed.render_as_string(hide_password=False)
+
+def async_connect_args(url: str) -> dict:
+    """asyncpg connect() arguments that can't come from the URL (it would pass them as strings)"""
+    parsed = make_url(url)
+    timeout = parsed.query.get("connect_timeout")
+    if parsed.drivername.split("+", 1)[0] in ("postgresql", "postgres") and timeout:
+        return {"timeout": float(timeout)}
+    return {}
+
+IS_SQLITE = "sqlite" in DATABASE_URL.lower()
+
+def timed_pool(base, name: str):
+    """`base` pool class whose checkouts are timed into db_pool_checkout_seconds{pool=name}"""
+    class TimedPool(base):
+        def _do_get(self):
+            with db_pool_checkout_seconds.time(pool=name):
+                return super()._do_get()
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
 
 # Add connection pool settings to prevent hanging
 # pool_pre_ping=True tests connections before using them
@@ -9,17 +71,88 @@ from app.core.config import DATABASE_URL
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,  # Verify connections before using them
-    pool_size=5,
-    max_overflow=10,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL.lower() else {}
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    poolclass=timed_pool(QueuePool, "sync"),
+    connect_args={"check_same_thread": False} if IS_SQLITE else {}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for code running on the event loop (asyncpg / aiosqlite)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL or to_async_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    poolclass=timed_pool(AsyncAdaptedQueuePool, "async"),
+    connect_args={} if ASYNC_DATABASE_URL else async_connect_args(DATABASE_URL),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+# Connection pool counters, see pool_stats()
+pool_counters = {
+    "sync": {"connects": 0, "checkouts": 0, "invalidations": 0},
+    "async": {"connects": 0, "checkouts": 0, "invalidations": 0},
+}
+
+def instrument_pool(sync_engine, counters: dict):
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        counters["connects"] += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        counters["checkouts"] += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        counters["invalidations"] += 1
+
+instrument_pool(engine, pool_counters["sync"])
+instrument_pool(async_engine.sync_engine, pool_counters["async"])
+
+def pool_stats() -> dict:
+    """Current size/usage of both connection pools plus lifetime counters"""
+    stats = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        stats[name] = {
+            "size": getattr(pool, "size", lambda: None)(),
+            "checked_out": getattr(pool, "checkedout", lambda: None)(),
+            "overflow": getattr(pool, "overflow", lambda: None)(),
+            **pool_counters[name],
+        }
+    return stats
+
+def _pool_connections() -> dict:
+    values = {}
+    for name, stats in pool_stats().items():
+        for state in ("size", "checked_out", "overflow"):
+            if stats[state] is not None:
+                values[(name, state)] = stats[state]
+        if stats["overflow"] is not None:
+            # QueuePool.overflow() starts at -pool_size; only the part above
+            # zero are connections opened beyond the pool size
+            values[(name, "overflow")] = max(stats["overflow"], 0)
+    return values
+
+Gauge("db_pool_connections", "Connections of the SQLAlchemy pools by state", ("pool", "state"),
+      collect=_pool_connections)
+Counter("db_pool_events_total", "Connects, checkouts and invalidations of the SQLAlchemy pools", ("pool", "event"),
+        collect=lambda: {(name, event): n for name, counters in pool_counters.items() for event, n in counters.items()})
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
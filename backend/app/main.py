@@ -1,11 +1,19 @@
 import asyncio
 from app.workers.stock_worker import stock_worker
-from fastapi import FastAPI
-from app.routers import stock, company, user, auth
-from app.services.user_service import define_user_chatid
-from app.utils.telegram import send_message
-from app.services.user_service import get_all_users
+from app.workers.stream_worker import stream_hub
+from fastapi import FastAPI, Response
+from app.routers import stock, company, user, auth, stream
+from app.services.user_service import define_user_chatid_async
+from app.utils.telegram import send_message, telegram_sender
+from app.services.user_service import iter_users_async
+from app.db.database import pool_stats
+from app.utils import metrics
+from app.services.company_service import symbol_directory
+from app.services.candle_store import candle_store
+from app.utils.market_calendar import market_calendar
+from app.core.config import CANDLE_STORE_FLUSH_SECONDS
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 
 app = FastAPI(title="Stock Bot API")
@@ -17,16 +25,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"], 
 )
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 app.include_router(stock.router)
 app.include_router(company.router)
 app.include_router(user.router)
 app.include_router(auth.router)
+app.include_router(stream.router)
 
 @app.on_event("startup")
 async def startup_event():
     # Start the background worker automatically
     # Wrap in try-except to prevent startup from hanging if worker fails
+    await telegram_sender.start()
+    market_calendar.check_holidays()
+    asyncio.create_task(symbol_directory.run_refresh_loop())
+    asyncio.create_task(candle_store.run_flush_loop(CANDLE_STORE_FLUSH_SECONDS))
     try:
         asyncio.create_task(stock_worker())
         print("Stock worker started successfully")
@@ -34,6 +48,15 @@ async def startup_event():
         print(f"Error starting stock worker: {e}")
         # Don't raise - allow the app to start even if worker fails
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stream_hub.stop()
+    await telegram_sender.stop()
+    try:
+        await asyncio.to_thread(candle_store.flush)
+    except Exception as e:
+        print(f"Error flushing the candle store on shutdown: {e}")
+
 @app.post("/webhook")
 async def telegram_webhook(update: dict):
     if "message" not in update: return {"ok": True}        
@@ -43,8 +66,8 @@ async def telegram_webhook(update: dict):
     if text.startswith("/start "):
         user_id = text.split(" ")[1]   
         # try:
-        define_user_chatid(user_id=user_id, chat_id=chat_id)
-        await send_message(chat_id=chat_id, msg=f"Successfully define chat id for user {user_id}")
+        await define_user_chatid_async(user_id=user_id, chat_id=chat_id)
+        await send_message(chat_id=chat_id, text=f"Successfully define chat id for user {user_id}")
         # return {"ok": True}
         # except Exception as e:
         #     raise HT
@@ -52,11 +75,20 @@ async def telegram_webhook(update: dict):
 
 @app.get("/test_telegram")
 async def test_telegram():
-    users = get_all_users()
-    for user in users:
-        await send_message(user.chat_id, "hello")
+    async for user in iter_users_async():
+        if user.chat_id:
+            await send_message(user.chat_id, "hello")
     return {"ok": True}
 
 @app.get("/health")
 def root():
-    return {"message": "ok"}
\ No newline at end of file
+    return {"message": "ok"}
+
+@app.get("/health/db")
+def db_health():
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Process metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -16,9 +16,9 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/login")
-def log_in(data: LoginRequest):
+async def log_in(data: LoginRequest):
     try:
-        response = login(data.email, data.password)
+        response = await login(data.email, data.password)
         return response
     except Exception as e:
         raise
\ No newline at end of file
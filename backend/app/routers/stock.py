@@ -1,15 +1,31 @@
 import json
 import logging
-from fastapi import APIRouter, status, HTTPException
-from vnstock import Trading, Listing
-from app.services.stock_api_service import get_price_today, get_mock_price # Assuming this exists
-from app.services.stock_service import get_all_stocks
+from fastapi import APIRouter, status, HTTPException, Query
+from vnstock import Listing
+from app.services.stock_api_service import get_price_today, get_mock_price, get_history, quote_cache
+from app.services.stock_service import get_all_stocks, normalize_symbol
+from app.services.price_board_service import get_price_board
+from app.utils.serialization import candles_response, CANDLE_FORMAT_PATTERN
+from app.utils.indicators import INDICATORS
+from app.utils.candles import TIMEFRAMES
+from app.core.config import PRICE_BOARD_MAX_SYMBOLS
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/stock", tags=["stock"])
 
+TIMEFRAME_PATTERN = "^(" + "|".join(TIMEFRAMES) + ")$"
+
+def next_cursor(series, since):
+    """
+    Time of the last closed candle: polling with it as `since` returns the
+    candles closed meanwhile plus the (updated) forming one.
+    """
+    if len(series) < 2:
+        return since
+    return series[len(series) - 2]["time"]
+
 @router.get("/")
 def get_all_stocks_in_db():
     try:
@@ -40,44 +56,50 @@ def get_all_stocks_in_db():
 #         )
 
 @router.get("/price-board")
-def get_price_board(symbol: str = "ACB"):
+def get_price_board_endpoint(symbol: str = "ACB", symbols: str | None = None):
     """
-    Get real-time price board data for a specific symbol.
+    Get real-time price board data for one symbol, or for a comma separated
+    list of `symbols` (fetched in a few batched upstream calls).
     """
+    requested = [normalize_symbol(s) for s in (symbols or symbol).split(",") if s.strip()]
+    requested = list(dict.fromkeys(requested))
+    if len(requested) > PRICE_BOARD_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {PRICE_BOARD_MAX_SYMBOLS} symbols per request"
+        )
     try:
-        # Initialize Trading without a dummy symbol if possible, 
-        # or use a default one if the library forces it.
-        # Note: price_board usually expects a list of symbols.
-        trading = Trading(symbol=symbol) 
-        
-        # Fetch data (Returns a Pandas DataFrame)
-        board_df = trading.price_board(symbols_list=[symbol])
-        
-        if board_df is None or board_df.empty:
-             raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
-
-        # Convert DataFrame to Dict (FastAPI handles the JSON serialization)
-        # orient='records' creates a list of objects: [{"ticker": "ACB", "price": ...}]
-        return board_df.to_dict(orient="records")
-        
+        rows = get_price_board(requested)
     except Exception as e:
-        logger.error(f"Error fetching price board for {symbol}: {e}")
+        logger.error(f"Error fetching price board for {requested}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"Failed to fetch stock data: {str(e)}"
         )
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No data found for symbols {', '.join(requested)}")
+    return rows
 
 @router.get("/price-today")
-def get_day_price(): # Fixed Typo 'pice' -> 'price'
+def get_day_price( # Fixed Typo 'pice' -> 'price'
+    symbol: str = "VGI",
+    since: str | None = None,
+    format: str = Query("records", pattern=CANDLE_FORMAT_PATTERN),
+):
+    """
+    Today's raw candles. With `since`, only the candles after that time;
+    pass back `next_since` from the previous response to poll for updates.
+    """
     try:
-        records_json = get_price_today()
-        
-        return {"data": records_json}
+        series = get_price_today(symbol.upper())
+        new = series.after(since) if since else series
+        return candles_response(new, format, next_since=next_cursor(series, since))
         
     except ValueError as e:
         logger.warning(f"Validation error in price-today: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"System error in price-today: {e}")
         raise HTTPException(
@@ -86,13 +108,70 @@ def get_day_price(): # Fixed Typo 'pice' -> 'price'
         )
 
 @router.get("/mock-price")
-def get_mock_price_endpoint():
+def get_mock_price_endpoint(
+    symbol: str = "VGI",
+    indicators: str = "RSI",
+    timeframe: str = Query("1m", pattern=TIMEFRAME_PATTERN),
+    since: str | None = None,
+    format: str = Query("records", pattern=CANDLE_FORMAT_PATTERN),
+):
+    """
+    Today's candles with RSI and the divergences found in them. With
+    `since`, only the candles after that time and the divergences ending
+    there; indexes stay relative to the whole day, `offset` is the index of
+    the first candle returned. `indicators` is a comma separated list of
+    RSI, MACD_HIST, STOCH_K and OBV; `timeframe` one of 1m, 5m, 15m, 30m, 1h.
+    """
+    names = [name.strip().upper() for name in indicators.split(",") if name.strip()]
+    unknown = [name for name in names if name not in INDICATORS]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown indicators: {', '.join(unknown)}")
     try:
-        records_json, divergences = get_mock_price()
-        return {"data": records_json, "divergences": divergences}
+        series, divergences = get_mock_price(symbol.upper(), names, timeframe)
+        new = series.after(since) if since else series
+        offset = len(series) - len(new)
+        return candles_response(
+            new, format,
+            divergences=[d for d in divergences if d["suffixIndex"] >= offset],
+            offset=offset,
+            next_since=next_cursor(series, since),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"System error in mock-price: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Internal Server Error"
-        )
\ No newline at end of file
+        )
+
+@router.get("/history")
+def get_history_endpoint(
+    symbol: str = "VGI",
+    start: str | None = None,
+    end: str | None = None,
+    format: str = Query("records", pattern=CANDLE_FORMAT_PATTERN),
+):
+    """
+    Archived 1m candles of a symbol from the local candle store.
+    """
+    try:
+        series = get_history(symbol.upper(), start, end)
+        return candles_response(series, format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"System error in history: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Internal Server Error"
+        )
+
+@router.get("/cache-stats")
+def get_cache_stats():
+    """
+    Hit/miss statistics of the shared quote cache.
+    """
+    return quote_cache.stats()
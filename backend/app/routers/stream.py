@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, status, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.services.stock_service import normalize_symbol
+from app.workers.stream_worker import Subscriber, stream_hub
+from app.utils.serialization import dumps
+from app.core.config import STREAM_MAX_SYMBOLS, STREAM_KEEPALIVE_SECONDS
+
+# Setup basic logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+def parse_symbols(symbols) -> list[str]:
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    return list(dict.fromkeys(normalize_symbol(s) for s in symbols if s.strip()))
+
+@router.get("/sse")
+async def stream_sse(request: Request, symbols: str):
+    """
+    Server-Sent Events feed of new candles and divergences of `symbols`
+    (comma separated). The data of each event is one JSON message.
+    """
+    requested = parse_symbols(symbols)
+    if not requested or len(requested) > STREAM_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Subscribe to between 1 and {STREAM_MAX_SYMBOLS} symbols"
+        )
+    subscriber = Subscriber()
+
+    async def events():
+        # Subscribed once the body is iterated, so the finally below always
+        # releases it (a response cancelled before that never subscribes)
+        try:
+            stream_hub.subscribe(subscriber, requested)
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {dumps(message).decode()}\n\n"
+        finally:
+            stream_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/ws")
+async def stream_ws(websocket: WebSocket, symbols: str = ""):
+    """
+    WebSocket feed of new candles and divergences.
+
+    Subscribe with the `symbols` query parameter and/or by sending
+    {"subscribe": [...]} or {"unsubscribe": [...]} at any time; invalid
+    messages are answered with {"type": "error"}. Each symbol starts with
+    a "snapshot" of the day's candles.
+    """
+    await websocket.accept()
+    subscriber = Subscriber()
+
+    def change(action, requested):
+        if action == "subscribe":
+            requested = requested[:max(STREAM_MAX_SYMBOLS - len(subscriber.symbols), 0)]
+            stream_hub.subscribe(subscriber, requested)
+        else:
+            stream_hub.unsubscribe(subscriber, requested)
+
+    async def receive():
+        while True:
+            text = await websocket.receive_text()
+            try:
+                request = json.loads(text)
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object")
+                changes = []
+                for action in ("subscribe", "unsubscribe"):
+                    if action in request:
+                        symbols = request[action]
+                        if isinstance(symbols, str):
+                            symbols = [symbols]
+                        if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+                            raise ValueError(f"'{action}' must be a list of symbols")
+                        changes.append((action, parse_symbols(symbols)))
+            except ValueError as e:
+                # Bad client message: report it, keep the connection
+                await websocket.send_json({"type": "error", "detail": f"Invalid message: {e}"})
+                continue
+            for action, symbols in changes:
+                change(action, symbols)
+            await websocket.send_json({"type": "subscribed", "symbols": sorted(subscriber.symbols)})
+
+    async def send():
+        while True:
+            await websocket.send_text(dumps(await subscriber.get()).decode())
+
+    tasks = []
+    try:
+        change("subscribe", parse_symbols(symbols))
+        tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.error(f"Error in stream websocket: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        stream_hub.unsubscribe(subscriber)
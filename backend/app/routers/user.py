@@ -1,9 +1,13 @@
 import json
 import logging
+from itertools import chain
 from fastapi import APIRouter, Request, Depends, status, HTTPException
-from app.services.user_service import get_all_users, create_user, add_stock_to_user
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from app.services.user_service import iter_users, get_users_page, create_user, add_stock_to_user, add_stocks_to_user
 from app.schemas.user import UserCreate
-from app.utils.middlewares import authen_restricted
+from app.core.security import password_hasher
+from app.utils.middlewares import authen_restricted, authen_claims
 from pydantic import BaseModel
 
 # Setup basic logging
@@ -12,33 +16,79 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/user", 
-    tags=["user"],
-    dependencies=[Depends(authen_restricted)]
+    tags=["user"]
 )
 
+# Routes reading or changing user data resolve the full user; routes that
+# only need the caller's id can trust the token claims instead
+restricted = [Depends(authen_restricted)]
+claims_only = [Depends(authen_claims)]
+
 class AddStockRequest(BaseModel):
     user_id: int
     symbol: str
 
-@router.get("/")
+class AddStocksRequest(BaseModel):
+    user_id: int
+    symbols: list[str]
+
+USERS_PAGE_SIZE = 500
+
+def stream_users_json(first_page):
+    """
+    Same JSON array as before, written page by page instead of built in
+    memory, starting from an already fetched first page.
+    """
+    try:
+        yield "["
+        users = first_page
+        if len(first_page) == USERS_PAGE_SIZE:
+            users = chain(first_page, iter_users(USERS_PAGE_SIZE, after_id=first_page[-1].id))
+        for i, user in enumerate(users):
+            yield ("," if i else "") + user.model_dump_json()
+        yield "]"
+    except Exception as e:
+        # The 200 status is already sent: abort the response rather than
+        # close the array, so clients see a broken body, not a short list
+        logger.error(f"Error streaming users, response aborted: {e}")
+        raise
+
+@router.get("/", dependencies=restricted)
 def get_all():
     try:
-        users = get_all_users()   
-        return users
+        # Fetched before responding so a failing database is still a 500
+        first_page = get_users_page(limit=USERS_PAGE_SIZE)
     except Exception as e:
         logger.error(f"Error getting all users: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    return StreamingResponse(stream_users_json(first_page), media_type="application/json")
+
+@router.get("/page", dependencies=restricted)
+def get_page(after_id: int = 0, limit: int = 100):
+    try:
+        users = get_users_page(after_id=after_id, limit=min(limit, 1000))
+        return {
+            "data": users,
+            "next_after_id": users[-1].id if users else None
+        }
+    except Exception as e:
+        logger.error(f"Error getting users page after {after_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.post("/")
-def create(user: UserCreate):
+@router.post("/", dependencies=restricted)
+async def create(user: UserCreate):
     try:
-        user = create_user(user)
+        # bcrypt runs on its own pool, the DB insert on the regular threadpool
+        password_hash = await password_hasher.hash(user.password)
+        user = await run_in_threadpool(create_user, user, password_hash)
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating user: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
-@router.put("/add_stock")
+@router.put("/add_stock", dependencies=restricted)
 def add_stock(data: AddStockRequest):
     try:
         user = add_stock_to_user(user_id=data.user_id, stock_symbol=data.symbol)
@@ -47,7 +97,16 @@ def add_stock(data: AddStockRequest):
         logger.error(f"Error add more stock to user {id}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("/telegram_connect")
+@router.put("/add_stocks", dependencies=restricted)
+def add_stocks(data: AddStocksRequest):
+    try:
+        user = add_stocks_to_user(user_id=data.user_id, stock_symbols=data.symbols)
+        return user
+    except Exception as e:
+        logger.error(f"Error adding stocks to user {data.user_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/telegram_connect", dependencies=claims_only)
 def get_link_connect_telegram(request: Request):
     user = request.state.user
     link = f"https://t.me/damianinvestbot?start={user.id}"
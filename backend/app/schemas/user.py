@@ -15,5 +15,10 @@ class UserResponse(BaseModel):
     name: str
     email: str
     phone: str
-    chat_id: str
+    chat_id: str | None = None
     stocks: list[str]
+
+class UserClaims(BaseModel):
+    """Principal built from the JWT claims alone, without a database lookup"""
+    id: int
+    email: str
@@ -0,0 +1,143 @@
+import numpy as np
+from app.services.stock_api_service import get_candles, get_history
+from app.services.divergence_service import DivergenceDetector
+
+
+def divergence_signals(series, min_matches=2):
+    """
+    Turn a candle series into trading signals in a single pass.
+
+    A candle is a sell (-1) when at least `min_matches` bearish divergences
+    are confirmed on it and a buy (+1) when at least `min_matches` bullish
+    ones are, bearish taking precedence, which is the rule is_divergence
+    applies. A divergence ending on a pivot is only known `order` candles
+    later, once the pivot is confirmed, so that is where its signal goes:
+    trading on the pivot itself would use future candles.
+
+    Returns:
+        int8 array with one signal per candle (0 = do nothing)
+    """
+    bearish = np.zeros(len(series), dtype=np.int32)
+    bullish = np.zeros(len(series), dtype=np.int32)
+    detector = DivergenceDetector()
+    for divergence in detector.update(series):
+        counts = bearish if divergence["type"] == "bearish" else bullish
+        # The candle whose arrival let the detector emit the divergence
+        counts[divergence["suffixIndex"] + detector.order] += 1
+
+    signals = np.zeros(len(series), dtype=np.int8)
+    signals[bullish >= min_matches] = 1
+    signals[bearish >= min_matches] = -1
+    return signals
+
+
+def run_backtest(data, initial_cash=50000, position_size=1.0, fee_rate=0.0, lot_size=1):
+    """
+    Backtest a portfolio over precomputed signals.
+
+    Args:
+        data: Dict of symbol -> (times, closes, signals) arrays, one entry per
+            candle. Symbols don't need to share the same timestamps.
+        initial_cash: Starting cash
+        position_size: Fraction of current equity spent on each buy (capped
+            by the available cash)
+        fee_rate: Transaction cost as a fraction of traded value, charged on
+            both buys and sells
+        lot_size: Quantities are rounded down to a multiple of this
+
+    Returns:
+        Dict with the merged "time" axis, the "cash" and "equity" curves on
+        that axis, and a "trades" log of parallel arrays (time, symbol, side,
+        price, quantity, fee)
+    """
+    symbols = list(data)
+    columns = [tuple(np.asarray(col) for col in data[symbol]) for symbol in symbols]
+    if not columns:
+        empty = np.array([])
+        return {"time": empty, "cash": empty, "equity": empty, "trades": _trade_log([])}
+
+    timeline = np.unique(np.concatenate([times for times, _, _ in columns]))
+    n_times, n_symbols = len(timeline), len(symbols)
+
+    # Close prices on the merged axis, carried forward over each symbol's gaps
+    prices = np.full((n_times, n_symbols), np.nan)
+    events = []
+    for k, (times, closes, signals) in enumerate(columns):
+        positions = np.searchsorted(timeline, times)
+        prices[positions, k] = closes
+        for i in np.flatnonzero(signals):
+            events.append((positions[i], k, signals[i]))
+    rows = np.where(np.isnan(prices), 0, np.arange(n_times)[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    prices = np.nan_to_num(prices[rows, np.arange(n_symbols)])
+
+    cash = float(initial_cash)
+    holdings = np.zeros(n_symbols)
+    cash_delta = np.zeros(n_times)
+    holdings_delta = np.zeros((n_times, n_symbols))
+    trades = []
+    # Only candles with a signal are visited; the curves are rebuilt from
+    # the per-trade deltas afterwards
+    for position, k, signal in sorted(events, key=lambda event: (event[0], event[1])):
+        price = prices[position, k]
+        if price <= 0:
+            continue
+        if signal > 0:
+            equity = cash + holdings @ prices[position]
+            budget = min(cash, position_size * equity)
+            quantity = (budget // (price * (1 + fee_rate) * lot_size)) * lot_size
+            if quantity <= 0:
+                continue
+            fee = quantity * price * fee_rate
+            cash_change = -(quantity * price + fee)
+            side = "buy"
+        else:
+            quantity = holdings[k]
+            if quantity <= 0:
+                continue
+            fee = quantity * price * fee_rate
+            cash_change = quantity * price - fee
+            quantity = -quantity
+            side = "sell"
+
+        cash += cash_change
+        holdings[k] += quantity
+        cash_delta[position] += cash_change
+        holdings_delta[position, k] += quantity
+        trades.append((timeline[position], symbols[k], side, price, abs(quantity), fee))
+
+    cash_curve = initial_cash + np.cumsum(cash_delta)
+    equity = cash_curve + (np.cumsum(holdings_delta, axis=0) * prices).sum(axis=1)
+    return {"time": timeline, "cash": cash_curve, "equity": equity, "trades": _trade_log(trades)}
+
+
+def _trade_log(trades):
+    names = ["time", "symbol", "side", "price", "quantity", "fee"]
+    if not trades:
+        return {name: np.array([]) for name in names}
+    return {name: np.array(values) for name, values in zip(names, zip(*trades))}
+
+
+def simulate_trading(symbols=('VGI',), initial_cash=50000, position_size=1.0, fee_rate=0.0, lot_size=1,
+                     start=None, end=None):
+    """
+    Backtest the divergence strategy on today's candles of `symbols`, or on
+    the archived candles between `start` and `end` when either is given.
+    """
+    data = {}
+    for symbol in symbols:
+        if start is None and end is None:
+            series = get_candles(symbol)
+        else:
+            series = get_history(symbol, start, end)
+        data[symbol] = (series['time'], series['close'], divergence_signals(series))
+    return run_backtest(data, initial_cash, position_size, fee_rate, lot_size)
+
+
+if __name__ == "__main__":
+    result = simulate_trading()
+    trades = result["trades"]
+    print("End of trading day: ")
+    print("Number of trades: " + str(len(trades["side"])))
+    print("Money in the bank: " + str(result["cash"][-1] if len(result["cash"]) else 0))
+    print("total value: " + str(result["equity"][-1] if len(result["equity"]) else 0))
@@ -0,0 +1,230 @@
+import asyncio
+import os
+import threading
+import numpy as np
+import pandas as pd
+from app.utils.candles import CandleSeries, to_ns
+from app.core.config import CANDLE_STORE_PATH, CANDLE_STORE_COMPACT_SEGMENTS
+
+STORE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+
+NS_PER_DAY = 86_400 * 10**9
+
+
+class CandleStore:
+    """
+    On-disk, append-only candle archive per (symbol, interval).
+
+    Candles are stored as compressed columnar segments
+    `<root>/<symbol>/<interval>/<first_ns>-<last_ns>.npz`, one array per
+    OHLCV column. append() only buffers the candles newer than what is
+    already stored, in memory; flush() (run periodically by
+    run_flush_loop and at shutdown) writes the buffer out as one segment
+    per trading day, merging into the day's segment when it exists, and
+    merges the day segments of each month once there are more than
+    `compact_segments` of them. Segment names carry their time range, so
+    reads only open the segments overlapping the requested range; reads
+    also see the buffered candles.
+
+    A crash loses at most the unflushed candles, which the next intraday
+    fetch of the day buffers again.
+    """
+
+    def __init__(self, root: str, compact_segments: int = 64):
+        self.root = root
+        self.compact_segments = compact_segments
+        self._last = {}  # (symbol, interval) -> last stored or buffered timestamp
+        self._pending = {}  # (symbol, interval) -> [CandleSeries] not written yet
+        self._flushing = {}  # (symbol, interval) -> CandleSeries being written
+        self._lock = threading.Lock()  # guards the in-memory state, never held for I/O
+        self._write_lock = threading.Lock()  # one writer (flush/compact) at a time
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def segments(self, symbol: str, interval: str) -> list[tuple[int, int, str]]:
+        """(first_ns, last_ns, path) of every segment, oldest first"""
+        directory = self._dir(symbol, interval)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            if not name.endswith(".npz"):
+                continue
+            first, last = name[:-4].split("-")
+            segments.append((int(first), int(last), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def last_timestamp(self, symbol: str, interval: str) -> int | None:
+        key = (symbol.upper(), interval)
+        if key not in self._last:
+            # Listed outside of the lock; a value set meanwhile (by append) wins
+            segments = self.segments(symbol, interval)
+            with self._lock:
+                self._last.setdefault(key, segments[-1][1] if segments else None)
+        return self._last[key]
+
+    def append(self, symbol: str, interval: str, series: CandleSeries) -> int:
+        """
+        Buffer the candles of `series` newer than the last stored one.
+
+        Returns:
+            Number of candles added
+        """
+        key = (symbol.upper(), interval)
+        self.last_timestamp(symbol, interval)  # lists the segments on first use, before locking
+        with self._lock:
+            last = self._last[key]
+            if last is not None:
+                series = series[int(np.searchsorted(series['time'], last, side='right')):]
+            if len(series) == 0:
+                return 0
+            self._pending.setdefault(key, []).append(series)
+            self._last[key] = int(series['time'][-1])
+            return len(series)
+
+    def flush(self, symbol: str | None = None, interval: str | None = None) -> int:
+        """
+        Write the buffered candles (of one symbol/interval, or all) to disk.
+
+        Returns:
+            Number of candles written
+        """
+        written = 0
+        with self._write_lock:
+            with self._lock:
+                keys = [
+                    key for key in self._pending
+                    if symbol is None or key == (symbol.upper(), interval)
+                ]
+            for key in keys:
+                with self._lock:
+                    # Stays readable through _flushing until it is on disk
+                    series = self._flushing[key] = CandleSeries.concat(self._pending.pop(key))
+                try:
+                    self._write_days(*key, series)
+                except BaseException:
+                    with self._lock:
+                        # Put it back in front of what arrived meanwhile
+                        self._pending[key] = [series] + self._pending.get(key, [])
+                    raise
+                finally:
+                    with self._lock:
+                        del self._flushing[key]
+                written += len(series)
+                if len(self.segments(*key)) > self.compact_segments:
+                    self._compact(*key)
+        return written
+
+    def _write_days(self, symbol: str, interval: str, series: CandleSeries):
+        """Write `series` as one segment per day, merging with the last segment if it's the same day"""
+        days = series['time'] // NS_PER_DAY
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for part in np.split(np.arange(len(series)), bounds):
+            chunk = series[int(part[0]):int(part[-1]) + 1]
+            segments = self.segments(symbol, interval)
+            previous = segments[-1] if segments else None
+            if previous is not None and previous[0] // NS_PER_DAY == chunk['time'][0] // NS_PER_DAY:
+                self._write(symbol, interval, CandleSeries.concat([self._load(previous[2]), chunk]))
+                os.remove(previous[2])
+            else:
+                self._write(symbol, interval, chunk)
+
+    async def run_flush_loop(self, interval: float):
+        """Background task writing the buffered candles every `interval` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Error flushing the candle store: {e}")
+
+    def read(self, symbol: str, interval: str, start=None, end=None) -> CandleSeries:
+        """Candles with start <= time <= end (either bound optional)"""
+        return CandleSeries.concat(list(self.iter_segments(symbol, interval, start, end)))
+
+    def iter_segments(self, symbol: str, interval: str, start=None, end=None):
+        """Yield the stored (then buffered) candles of [start, end] one segment at a time"""
+        start, end = to_ns(start), to_ns(end)
+        key = (symbol.upper(), interval)
+        # Memory first: candles a concurrent flush moves to disk are then
+        # seen twice at worst, never missed, and the duplicates are cut
+        # by only yielding times after the last one yielded
+        with self._lock:
+            memory = ([self._flushing[key]] if key in self._flushing else []) + list(self._pending.get(key, []))
+        after = None
+        segments = self.segments(symbol, interval)
+        i = 0
+        while i < len(segments):
+            first, last, path = segments[i]
+            i += 1
+            if end is not None and first > end:
+                break
+            if start is not None and last < start:
+                continue
+            try:
+                series = self._load(path)
+            except FileNotFoundError:
+                # Merged into a new segment by a concurrent flush or
+                # compaction: list again and carry on after what was yielded
+                segments = [seg for seg in self.segments(symbol, interval) if after is None or seg[1] > after]
+                i = 0
+                continue
+            part = self._slice(series, start, end, after)
+            if len(part):
+                after = int(part['time'][-1])
+                yield part
+        for series in memory:
+            part = self._slice(series, start, end, after)
+            if len(part):
+                after = int(part['time'][-1])
+                yield part
+
+    @staticmethod
+    def _slice(series: CandleSeries, start, end, after) -> CandleSeries:
+        times = series['time']
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        if after is not None:
+            lo = max(lo, int(np.searchsorted(times, after, side='right')))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+        return series[lo:max(hi, lo)]
+
+    def compact(self, symbol: str, interval: str):
+        """Flush, then merge the segments of each calendar month into a single segment"""
+        self.flush(symbol, interval)
+        with self._write_lock:
+            self._compact(symbol, interval)
+
+    def _compact(self, symbol: str, interval: str):
+        months = {}
+        for segment in self.segments(symbol, interval):
+            month = pd.Timestamp(segment[0]).strftime("%Y%m")
+            months.setdefault(month, []).append(segment)
+        for segments in months.values():
+            if len(segments) < 2:
+                continue
+            merged = CandleSeries.concat([self._load(path) for _, _, path in segments])
+            self._write(symbol, interval, merged)
+            for _, _, path in segments:
+                os.remove(path)
+
+    def _write(self, symbol: str, interval: str, series: CandleSeries):
+        directory = self._dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        times = series['time']
+        path = os.path.join(directory, f"{int(times[0])}-{int(times[-1])}.npz")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **{name: series[name] for name in STORE_COLUMNS})
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _load(path: str) -> CandleSeries:
+        with np.load(path) as data:
+            return CandleSeries({name: data[name] for name in STORE_COLUMNS})
+
+
+candle_store = CandleStore(CANDLE_STORE_PATH, CANDLE_STORE_COMPACT_SEGMENTS)
@@ -1,17 +1,120 @@
-from datetime import date
-import pandas as pd
-import numpy as np
-import talib
+import asyncio
+import json
+import os
+import threading
+import time
 from vnstock import Listing
+from app.utils.metrics import vnstock_fetch_seconds, vnstock_fetch_errors
+from app.core.config import SYMBOL_SNAPSHOT_PATH, SYMBOL_REFRESH_SECONDS
+
+
+class SymbolDirectory:
+    """
+    In-memory directory of every listed company, indexed by symbol.
+
+    The listing is downloaded once, saved as a JSON snapshot so the next
+    startup can serve lookups without the network, and refreshed in the
+    background every `refresh_interval` seconds.
+    """
+
+    def __init__(self, snapshot_path: str, refresh_interval: float):
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self._records = []
+        self._index = {}
+        self._lock = threading.Lock()
+        # Serializes loading and refreshing, so concurrent callers on a cold
+        # start share one download and one snapshot write
+        self._load_lock = threading.Lock()
+        self.updated_at = None  # wall-clock time of the listing currently held
+
+    def _set(self, records: list[dict], updated_at: float):
+        index = {str(record.get("symbol")).upper(): record for record in records}
+        with self._lock:
+            self._records = records
+            self._index = index
+            self.updated_at = updated_at
+
+    def load_snapshot(self) -> bool:
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self._set(snapshot["records"], snapshot["updated_at"])
+        return True
+
+    def save_snapshot(self):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": self.updated_at, "records": self._records}, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def refresh(self):
+        """Download the full market listing and replace the index"""
+        seen = self.updated_at
+        with self._load_lock:
+            if self.updated_at != seen:
+                # Another caller loaded or refreshed it while we waited
+                return
+            self._refresh()
+
+    def _refresh(self):
+        with vnstock_fetch_seconds.time(errors=vnstock_fetch_errors, source="default", endpoint="all_symbols"):
+            df = Listing().all_symbols()
+        self._set(df.to_dict(orient="records"), time.time())
+        try:
+            self.save_snapshot()
+        except OSError as e:
+            print(f"Error saving symbol snapshot: {e}")
+
+    def ensure_loaded(self):
+        if self.updated_at is not None:
+            return
+        with self._load_lock:
+            if self.updated_at is None and not self.load_snapshot():
+                self._refresh()
+
+    def is_stale(self) -> bool:
+        return self.updated_at is None or time.time() - self.updated_at > self.refresh_interval
+
+    def get(self, symbol: str) -> dict | None:
+        self.ensure_loaded()
+        return self._index.get(symbol.upper())
+
+    def all(self) -> list[dict]:
+        self.ensure_loaded()
+        return self._records
+
+    async def run_refresh_loop(self):
+        """Background task keeping the directory fresh"""
+        while True:
+            try:
+                await asyncio.to_thread(self.ensure_loaded)
+                if self.is_stale():
+                    await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Error refreshing symbol directory: {e}")
+            await asyncio.sleep(min(self.refresh_interval, 3600))
+
+
+symbol_directory = SymbolDirectory(SYMBOL_SNAPSHOT_PATH, SYMBOL_REFRESH_SECONDS)
 
 def get_all_companies():
     """
     Get all the companies available on market
     """
-    try: 
-        listing = Listing()
-        df = listing.all_symbols()
-        return df.to_dict(orient="records")
+    try:
+        return symbol_directory.all()
     except Exception as e:
         print(f"Error fetching all stock symbols: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def get_company(symbol: str) -> dict | None:
+    """
+    Look up one listed company by symbol
+    """
+    return symbol_directory.get(symbol)
@@ -0,0 +1,205 @@
+import json
+from collections import deque
+import numpy as np
+import talib
+from app.services.stock_api_service import is_in_range
+from app.services.candle_store import candle_store
+from app.utils.candles import as_series, format_time
+from app.services.indicator_service import divergence_rules
+
+# Closes carried over from the previous chunk to seed RSI; Wilder smoothing
+# forgets its seed by a factor 13/14 per bar, so this is exact to float precision
+RSI_WARMUP = 1000
+
+
+class DivergenceDetector:
+    """
+    Streaming version of tim_phan_ky for a single symbol and oscillator.
+
+    Feed it candles as they arrive with update(); it keeps only the last
+    2 * order + 1 candles needed to confirm a pivot plus the pivots of the
+    last `max_distance` bars, so each candle costs O(1) no matter how long
+    the session gets. Given the same candles it emits the same divergences
+    as tim_phan_ky, in the same order.
+    """
+
+    def __init__(self, order=5, min_distance=10, max_distance=60, indicator='RSI', lower=35, upper=65):
+        self.indicator = indicator
+        self.lower = lower
+        self.upper = upper
+        self.order = order
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.count = 0  # number of candles consumed so far
+        self._window = deque(maxlen=2 * order + 1)
+        self._peaks = deque()  # (index, high, indicator) of recent pivot highs
+        self._troughs = deque()  # (index, low, indicator) of recent pivot lows
+
+    def reset(self):
+        self.count = 0
+        self._window.clear()
+        self._peaks.clear()
+        self._troughs.clear()
+
+    def update(self, candles):
+        """
+        Consume newly arrived candles.
+
+        Args:
+            candles: CandleSeries (or list of records) with high, low and the indicator
+
+        Returns:
+            List of divergences confirmed by these candles, shaped like the
+            ones returned by tim_phan_ky
+        """
+        events = []
+        candles = as_series(candles)
+        columns = (candles['high'].tolist(), candles['low'].tolist(), candles[self.indicator].tolist())
+        for candle in zip(*columns):
+            self._window.append(candle)
+            self.count += 1
+            if len(self._window) == self._window.maxlen:
+                # The middle candle now has `order` neighbours on both sides
+                self._confirm(self.count - 1 - self.order, events)
+        return events
+
+    def _confirm(self, index, events):
+        high, low, rsi = self._window[self.order]
+        is_peak = not any(h > high for h, _, _ in self._window)
+        is_trough = not any(l < low for _, l, _ in self._window)
+
+        if is_peak:
+            self._match(self._peaks, index, high, rsi, 'bearish', events)
+            self._peaks.append((index, high, rsi))
+        if is_trough:
+            self._match(self._troughs, index, low, rsi, 'bullish', events)
+            self._troughs.append((index, low, rsi))
+
+    def _match(self, pivots, index, price, rsi, type, events):
+        while pivots and index - pivots[0][0] > self.max_distance:
+            pivots.popleft()
+
+        for old_idx, old_price, old_rsi in reversed(pivots):
+            if index - old_idx < self.min_distance:
+                continue
+            if not (is_in_range(rsi, type, self.lower, self.upper) or is_in_range(old_rsi, type, self.lower, self.upper)):
+                continue
+            if type == 'bearish':
+                found = price > old_price and rsi < old_rsi
+            else:
+                found = price < old_price and rsi > old_rsi
+            if found:
+                events.append({
+                    "prefixIndex": old_idx,
+                    "suffixIndex": index,
+                    "type": type
+                })
+
+
+class DivergenceSet:
+    """
+    One DivergenceDetector per (indicator, lower, upper) rule, fed the same
+    candles. The candles must carry every rule's indicator column, see
+    indicator_service.add_indicators; events get an "indicator" key.
+    """
+
+    def __init__(self, rules=None, **detector_args):
+        rules = divergence_rules if rules is None else rules
+        self.detectors = [
+            DivergenceDetector(indicator=name, lower=lower, upper=upper, **detector_args)
+            for name, lower, upper in rules
+        ]
+
+    @property
+    def indicators(self) -> list[str]:
+        return list(dict.fromkeys(detector.indicator for detector in self.detectors))
+
+    @property
+    def count(self) -> int:
+        return self.detectors[0].count if self.detectors else 0
+
+    def update(self, candles):
+        events = []
+        for detector in self.detectors:
+            for event in detector.update(candles):
+                events.append({**event, "indicator": detector.indicator})
+        return sorted(events, key=lambda event: event["suffixIndex"])
+
+
+def scan_divergences(symbol: str, out, interval: str = '1m', start=None, end=None,
+                     chunk_size: int = 50_000, **detector_args) -> int:
+    """
+    Scan archived candles for divergences without loading them all at once.
+
+    History is read from the candle store one segment at a time, in windows
+    of at most `chunk_size` candles. RSI is computed per window, seeded with
+    the closes of the previous one, and a single DivergenceDetector carries
+    the pivots and lookback across windows, so the events are the same as
+    tim_phan_ky over the whole range while memory stays bounded by the
+    window size.
+
+    Args:
+        out: text file the events are written to, one JSON object per line
+        start, end: inclusive bounds, as in CandleStore.read
+
+    Returns:
+        Number of divergences written
+    """
+    detector = DivergenceDetector(**detector_args)
+    # Times of the previous candles an event can still refer to
+    lookback = detector.max_distance + detector.order + 1
+    times = np.empty(0, dtype=np.int64)
+    closes = np.empty(0, dtype=np.float64)
+    written = 0
+
+    for segment in candle_store.iter_segments(symbol, interval, start, end):
+        for lo in range(0, len(segment), chunk_size):
+            chunk = segment[lo:lo + chunk_size]
+            closes = np.concatenate([closes, chunk['close']])
+            rsi = talib.RSI(closes, timeperiod=14)[len(closes) - len(chunk):]
+            closes = closes[-RSI_WARMUP:]
+
+            chunk = chunk.with_column('RSI', rsi)
+            if np.isnan(rsi).any():
+                chunk = chunk.take(~np.isnan(rsi))
+
+            offset = detector.count - len(times)
+            times = np.concatenate([times, chunk['time']])
+            for event in detector.update(chunk):
+                event = {
+                    "symbol": symbol,
+                    **event,
+                    "prefixTime": format_time(times[event["prefixIndex"] - offset]),
+                    "suffixTime": format_time(times[event["suffixIndex"] - offset]),
+                }
+                out.write(json.dumps(event) + "\n")
+                written += 1
+            times = times[-lookback:]
+            out.flush()
+    return written
+
+
+def scan_market(symbols, path: str, interval: str = '1m', start=None, end=None, **scan_args) -> int:
+    """Run scan_divergences for every symbol into one JSON Lines file"""
+    written = 0
+    with open(path, "w") as out:
+        for symbol in symbols:
+            count = scan_divergences(symbol, out, interval, start, end, **scan_args)
+            print(f"{symbol}: {count} divergences")
+            written += count
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scan archived candles for RSI divergences")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--out", default="divergences.jsonl")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+    total = scan_market(args.symbols, args.out, args.interval, args.start, args.end, chunk_size=args.chunk_size)
+    print(f"Wrote {total} divergences to {args.out}")
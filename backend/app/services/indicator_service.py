@@ -0,0 +1,60 @@
+import zlib
+import numpy as np
+from app.utils.cache import TTLCache
+from app.utils.candles import CandleSeries, BAR_COLUMNS
+from app.utils.indicators import INDICATORS, parse_rules
+from app.utils.metrics import indicator_seconds, indicator_symbol_seconds, watch_cache
+from app.core.config import INDICATOR_CACHE_TTL, INDICATOR_CACHE_SIZE, DIVERGENCE_INDICATORS
+
+# Computed indicator columns, keyed by (symbol, interval, indicator, candle batch)
+indicator_cache = watch_cache("indicator", TTLCache(maxsize=INDICATOR_CACHE_SIZE, ttl=INDICATOR_CACHE_TTL))
+# (indicator, lower, upper) divergence rules of DIVERGENCE_INDICATORS, used
+# alike by the worker, the streams and the API
+divergence_rules = parse_rules(DIVERGENCE_INDICATORS)
+divergence_indicators = list(dict.fromkeys(name for name, _, _ in divergence_rules))
+
+def rules_for(names) -> list[tuple]:
+    """Divergence rules of `names`: the configured ones, else the indicator's own zones"""
+    rules = []
+    for name in names:
+        configured = [rule for rule in divergence_rules if rule[0] == name]
+        rules.extend(configured or [(name, INDICATORS[name].lower, INDICATORS[name].upper)])
+    return rules
+
+def batch_key(series: CandleSeries):
+    """
+    Identifies a candle batch: same length, same ends and the same OHLCV
+    values, through a CRC of each column. Any change of the forming candle
+    or revision of an earlier one gives a new key; hashing a day of candles
+    costs microseconds.
+    """
+    if len(series) == 0:
+        return (0,)
+    times = series['time']
+    digest = 0
+    for name in BAR_COLUMNS[1:]:
+        digest = zlib.crc32(np.ascontiguousarray(series[name]), digest)
+    return (len(series), int(times[0]), int(times[-1]), digest)
+
+def compute(symbol: str, interval: str, name: str, series: CandleSeries):
+    with indicator_seconds.time(interval=interval, indicator=name), indicator_symbol_seconds.time(symbol=symbol):
+        return INDICATORS[name].compute(series)
+
+def add_indicators(symbol: str, interval: str, series: CandleSeries, names) -> CandleSeries:
+    """
+    Return `series` with a column for each indicator in `names`.
+
+    Columns already on the series are kept as they are; the others are
+    computed at most once per (symbol, interval, batch) and shared by every
+    caller (worker, streams, API) asking for the same batch.
+    """
+    batch = batch_key(series)
+    for name in names:
+        if name in series:
+            continue
+        values = indicator_cache.get_or_load(
+            (symbol, interval, name, batch),
+            lambda name=name: compute(symbol, interval, name, series)
+        )
+        series = series.with_column(name, values)
+    return series
@@ -1,18 +1,47 @@
+import asyncio
 import jwt
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.schemas.user import UserResponse
-from app.core.security import check_password
-from app.db.database import SessionLocal
+from app.core.security import password_hasher, needs_rehash
+from app.db.database import SessionLocal, AsyncSessionLocal
 from app.core.config import SECRET_KEY, ALGORITHM
 
-def login(email: str, password: str):
-    db = SessionLocal()
+async def get_credentials_async(email: str):
+    """Fetch (id, email, password_hash) of the user with this email"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User.id, User.email, User.password_hash).where(User.email == email)
+        )
+        return result.first()
+
+async def update_password_hash_async(user_id: int, password_hash: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.id == user_id).values(password_hash=password_hash))
+        await db.commit()
+
+# Background rehashes in progress (the event loop only keeps weak references)
+rehash_tasks = set()
+
+async def rehash_password(user_id: int, password: str):
+    """
+    Best-effort upgrade of a verified password's hash. On failure (hasher
+    queue full at a login burst, database error) the old hash stays valid
+    and the upgrade is retried at the next login.
+    """
     try:
-        user = db.query(User).filter(User.email == email).first()
+        new_hash = await password_hasher.hash(password)
+        await update_password_hash_async(user_id, new_hash)
+    except Exception as e:
+        print(f"Could not rehash the password of user {user_id}: {e}")
+
+async def login(email: str, password: str):
+    try:
+        user = await get_credentials_async(email)
         print(f"user is {user}" )
         if not user:
             raise HTTPException(
@@ -20,11 +49,18 @@ def login(email: str, password: str):
                 detail=f"User with email {email} does not exist"
             )
         
-        if not check_password(password=password, hashed_password=user.password_hash):
+        if not await password_hasher.verify(password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Password is invalid"
             )
+
+        # The configured cost changed since this hash was made: upgrade it
+        # now that we have the plain password, without holding up the login
+        if needs_rehash(user.password_hash):
+            task = asyncio.create_task(rehash_password(user.id, password))
+            rehash_tasks.add(task)
+            task.add_done_callback(rehash_tasks.discard)
         
         token = jwt.encode(
             {
@@ -40,8 +76,10 @@ def login(email: str, password: str):
             "token": token,
             "id": user.id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error logging in {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,124 @@
+import threading
+import time
+from concurrent.futures import Future
+import pandas as pd
+from vnstock import Trading
+from app.utils.cache import TTLCache
+from app.utils.metrics import vnstock_fetch_seconds, vnstock_fetch_errors, watch_cache
+from app.services.stock_api_service import source_limiters
+from app.core.config import (
+    PRICE_BOARD_TTL, PRICE_BOARD_WINDOW, PRICE_BOARD_BATCH_SIZE, PRICE_BOARD_CACHE_SIZE
+)
+
+
+def fetch_price_board(symbols: list[str], source: str = 'VCI') -> list[dict]:
+    """One upstream price_board call for `symbols`, as JSON-ready records"""
+    source_limiters.get(source).acquire()
+    with vnstock_fetch_seconds.time(errors=vnstock_fetch_errors, source=source, endpoint="price_board"):
+        board_df = Trading(symbol=symbols[0], source=source).price_board(symbols_list=symbols)
+    if board_df is None or board_df.empty:
+        return []
+    if isinstance(board_df.columns, pd.MultiIndex):
+        # e.g. ("listing", "symbol") -> "listing_symbol"
+        board_df.columns = ["_".join(str(level) for level in col) for col in board_df.columns]
+    board_df = board_df.astype(object).where(board_df.notna(), None)
+    return board_df.to_dict(orient="records")
+
+
+def record_symbol(record: dict) -> str | None:
+    for name, value in record.items():
+        if name == "symbol" or str(name).endswith("_symbol"):
+            return value
+    return None
+
+
+class PriceBoardBatcher:
+    """
+    Coalesces price board lookups into batched upstream calls.
+
+    Symbols missing from the cache are collected into an open batch for
+    `window` seconds; whichever request opened the batch then fetches every
+    symbol gathered meanwhile, `batch_size` at a time, and all the waiting
+    requests pick their rows out of the result. A symbol already being
+    fetched is waited on rather than fetched again. Rows are cached for the
+    TTL of `cache`.
+    """
+
+    def __init__(self, fetch, cache: TTLCache, window: float = 0.05, batch_size: int = 50):
+        self._fetch = fetch
+        self.cache = cache
+        self.window = window
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._open = None  # (symbols, Future) of the batch still collecting symbols
+        self._inflight = {}  # symbol -> Future of the batch fetching it
+        self.upstream_calls = 0
+
+    def get(self, symbols: list[str]) -> dict:
+        """
+        Returns:
+            symbol -> price board row, for the symbols the upstream knows
+        """
+        rows = {}
+        waiting = []
+        leader = None
+        for symbol in symbols:
+            row = self.cache.get(symbol)
+            if row is not None:
+                rows[symbol] = row
+                continue
+            with self._lock:
+                future = self._inflight.get(symbol)
+                if future is None:
+                    if self._open is None:
+                        self._open = leader = (set(), Future())
+                    self._open[0].add(symbol)
+                    future = self._inflight[symbol] = self._open[1]
+            waiting.append((symbol, future))
+
+        if leader is not None:
+            self._run(*leader)
+        for symbol, future in waiting:
+            row = future.result().get(symbol)
+            if row is not None:
+                rows[symbol] = row
+        return rows
+
+    def _run(self, symbols: set, future: Future):
+        time.sleep(self.window)
+        with self._lock:
+            self._open = None
+            symbols = sorted(symbols)
+        results, error = {}, None
+        try:
+            for i in range(0, len(symbols), self.batch_size):
+                self.upstream_calls += 1
+                for row in self._fetch(symbols[i:i + self.batch_size]):
+                    symbol = record_symbol(row)
+                    if symbol is not None:
+                        results[symbol] = row
+                        self.cache.set(symbol, row)
+        except Exception as e:
+            error = e
+        with self._lock:
+            for symbol in symbols:
+                if self._inflight.get(symbol) is future:
+                    del self._inflight[symbol]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(results)
+
+
+price_board = PriceBoardBatcher(
+    fetch_price_board,
+    watch_cache("price_board", TTLCache(maxsize=PRICE_BOARD_CACHE_SIZE, ttl=PRICE_BOARD_TTL)),
+    window=PRICE_BOARD_WINDOW,
+    batch_size=PRICE_BOARD_BATCH_SIZE,
+)
+
+
+def get_price_board(symbols: list[str]) -> list[dict]:
+    """Price board rows of `symbols`, in the requested order"""
+    rows = price_board.get(symbols)
+    return [rows[symbol] for symbol in symbols if symbol in rows]
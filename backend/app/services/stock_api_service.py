@@ -1,18 +1,47 @@
-from datetime import date
+import math
+import threading
 import pandas as pd
 import numpy as np
 import talib
 from vnstock import Quote
+from app.utils.stock_util import find_pivots
+from app.utils.candles import CandleSeries, BarAggregator, TIMEFRAMES, as_series, to_ns
+from app.utils.cache import TTLCache
+from app.utils.rate_limit import RateLimiterRegistry
+from app.utils.market_calendar import market_calendar
+from app.utils.metrics import vnstock_fetch_seconds, vnstock_fetch_errors, indicator_seconds, indicator_symbol_seconds, watch_cache
+from app.utils.indicators import RollingRSI
+from app.services.indicator_service import add_indicators, rules_for
+from app.services.candle_store import candle_store, NS_PER_DAY
+from app.core.config import QUOTE_CACHE_TTL, QUOTE_CACHE_SIZE, VNSTOCK_RATE_LIMIT, VNSTOCK_RATE_BURST, WORKER_POLL_DELAY
+
+# Process-wide cache of upstream intraday frames with the time they were
+# fetched, keyed by (symbol, source, interval). Cached frames are shared
+# between callers and must not be modified in place.
+quote_cache = watch_cache("quote", TTLCache(maxsize=QUOTE_CACHE_SIZE, ttl=QUOTE_CACHE_TTL))
+# Token bucket per upstream source, shared by API requests and the worker
+source_limiters = RateLimiterRegistry(rate=VNSTOCK_RATE_LIMIT, capacity=VNSTOCK_RATE_BURST)
+# Incremental RSI of today's candles per (symbol, timeframe), see
+# rolling_rsi(). Each state has its own lock; `states_lock` only guards
+# creating them.
+rsi_states: dict[tuple[str, str], RollingRSI] = {}
+# Archived bars fed to a new day's RSI state, see history_closes()
+RSI_SEED_BARS = 100
+# Higher timeframe bars of today's candles per (symbol, timeframe), see get_bars()
+bar_aggregators: dict[tuple[str, str], BarAggregator] = {}
+states_lock = threading.Lock()
 
 # --- 1. CÁC HÀM HỖ TRỢ LOGIC ---
 
-def is_in_range(val_rsi, type='any'):
-    """Kiểm tra RSI có nằm trong vùng quá mua/quá bán không"""
+def is_in_range(val_rsi, type='any', lower=35, upper=65):
+    """Kiểm tra RSI có nằm trong vùng quá mua/quá bán không (None: không giới hạn vùng)"""
+    oversold = lower is None or val_rsi < lower
+    overbought = upper is None or val_rsi > upper
     if type == 'bearish': 
-        return val_rsi > 65
+        return overbought
     if type == 'bullish': 
-        return val_rsi < 35
-    return val_rsi < 35 or val_rsi > 65
+        return oversold
+    return oversold or overbought
 
 def is_peak(df, i, order=5):
     if i < order or i >= len(df) - order:
@@ -40,33 +69,42 @@ def is_trough(df, i, order=5):
             return False
     return True
 
-def is_divergence(df, index):
-    peaks = []
-    troughs = []
+def is_divergence(df, index, pivots=None, indicator='RSI', lower=35, upper=65):
+    """
+    Check whether candle `index` closes a divergence.
+
+    `pivots` is the (peaks, troughs) pair from find_pivots; pass it in when
+    checking many indexes of the same series so it is only computed once.
+    `indicator` is the oscillator column compared with price, `lower`/`upper`
+    its oversold/overbought zones (None for no zone).
+    """
+    df = as_series(df)
+    highs, lows, rsi = df['high'], df['low'], df[indicator]
+    if pivots is None:
+        pivots = find_pivots(df)
+    is_peaks, is_troughs = pivots
+    # Only pivots before `index` can pair with it
+    peaks = np.flatnonzero(is_peaks[:index])
+    troughs = np.flatnonzero(is_troughs[:index])
 
-    for i in range(len(df)):
-        if is_peak(df, i):
-            peaks.append(i)
-        if is_trough(df, i):
-            troughs.append(i)
     bearish_cnt = 0
     bullish_cnt = 0
-    if is_peak(df, index):
+    if is_peaks[index]:
         for j in range(len(peaks) - 1, -1, -1): 
-            old_idx = peaks[j]
+            old_idx = int(peaks[j])
             
             distance = index - old_idx
             if distance > 60: break 
             if distance < 10: continue 
             
-            if is_in_range(df[index]["RSI"], 'bearish') or is_in_range(df[old_idx]["RSI"], 'bearish'):
+            if is_in_range(rsi[index], 'bearish', lower, upper) or is_in_range(rsi[old_idx], 'bearish', lower, upper):
                 
-                if df[index]["high"] > df[old_idx]["high"] and df[index]["RSI"] < df[old_idx]["RSI"]:
+                if highs[index] > highs[old_idx] and rsi[index] < rsi[old_idx]:
                     bearish_cnt += 1
                     if bearish_cnt >= 2:
                         print(f"🔴 [BEARISH] Tìm thấy Phân kỳ ÂM tại dòng {index}")
-                        print(f"   - Đỉnh cũ ({df[old_idx]['time']}): Giá {df[old_idx]['high']} | RSI {df[old_idx]['RSI']:.2f}")
-                        print(f"   - Đỉnh mới ({df[index]['time']}): Giá {df[index]['high']} | RSI {df[index]['RSI']:.2f}")
+                        print(f"   - Đỉnh cũ ({df[old_idx]['time']}): Giá {highs[old_idx]} | {indicator} {rsi[old_idx]:.2f}")
+                        print(f"   - Đỉnh mới ({df[index]['time']}): Giá {highs[index]} | {indicator} {rsi[index]:.2f}")
                         print("-" * 40)
                         divergence = {
                             "prefixIndex": old_idx,
@@ -75,22 +113,22 @@ def is_divergence(df, index):
                         }
                         return divergence                
             
-    if is_trough(df, index):
+    if is_troughs[index]:
         for j in range(len(troughs) - 1, -1, -1):
-            old_idx = troughs[j]
+            old_idx = int(troughs[j])
             
             distance = index - old_idx
             if distance > 60: break
             if distance < 10: continue
             
-            if is_in_range(df[index]["RSI"], 'bullish') or is_in_range(df[old_idx]["RSI"], 'bullish'):
+            if is_in_range(rsi[index], 'bullish', lower, upper) or is_in_range(rsi[old_idx], 'bullish', lower, upper):
                 
-                if df[index]["low"] < df[old_idx]["low"] and df[index]["RSI"] > df[old_idx]["RSI"]:
+                if lows[index] < lows[old_idx] and rsi[index] > rsi[old_idx]:
                     bullish_cnt += 1
                     if bullish_cnt >= 2:
                         print(f"🟢 [BULLISH] Tìm thấy Phân kỳ DƯƠNG tại dòng {index}")
-                        print(f"   - Đáy cũ ({df[old_idx]['time']}): Giá {df[old_idx]['low']} | RSI {df[old_idx]['RSI']:.2f}")
-                        print(f"   - Đáy mới ({df[index]['time']}): Giá {df[index]['low']} | RSI {df[index]['RSI']:.2f}")
+                        print(f"   - Đáy cũ ({df[old_idx]['time']}): Giá {lows[old_idx]} | {indicator} {rsi[old_idx]:.2f}")
+                        print(f"   - Đáy mới ({df[index]['time']}): Giá {lows[index]} | {indicator} {rsi[index]:.2f}")
                         print("-" * 40)     
                         divergence = {
                             "prefixIndex": old_idx,
@@ -100,15 +138,17 @@ def is_divergence(df, index):
                         return divergence
     return None
 
-def tim_phan_ky(df):
-    n = len(df)
+def tim_phan_ky(df, indicator='RSI', lower=35, upper=65):
     peaks = []   
     troughs = [] 
 
     divergences = []  # (prefix index: number, suffix index: number, {bearish or bullish}: enum)
+    df = as_series(df)
+    highs, lows, rsi = df['high'], df['low'], df[indicator]
+    is_peaks, is_troughs = find_pivots(df)
     
-    for i in range(n):
-        if is_peak(df, i):
+    for i in np.flatnonzero(is_peaks | is_troughs).tolist():
+        if is_peaks[i]:
             for j in range(len(peaks) - 1, -1, -1): 
                 old_idx = peaks[j]
                 
@@ -116,12 +156,12 @@ def tim_phan_ky(df):
                 if distance > 60: break 
                 if distance < 10: continue 
                 
-                if is_in_range(df[i]["RSI"], 'bearish') or is_in_range(df[old_idx]["RSI"], 'bearish'):
+                if is_in_range(rsi[i], 'bearish', lower, upper) or is_in_range(rsi[old_idx], 'bearish', lower, upper):
                     
-                    if df[i]["high"] > df[old_idx]["high"] and df[i]["RSI"] < df[old_idx]["RSI"]:
+                    if highs[i] > highs[old_idx] and rsi[i] < rsi[old_idx]:
                         print(f"🔴 [BEARISH] Tìm thấy Phân kỳ ÂM tại dòng {i}")
-                        print(f"   - Đỉnh cũ ({df[old_idx]['time']}): Giá {df[old_idx]['high']} | RSI {df[old_idx]['RSI']:.2f}")
-                        print(f"   - Đỉnh mới ({df[i]['time']}): Giá {df[i]['high']} | RSI {df[i]['RSI']:.2f}")
+                        print(f"   - Đỉnh cũ ({df[old_idx]['time']}): Giá {highs[old_idx]} | {indicator} {rsi[old_idx]:.2f}")
+                        print(f"   - Đỉnh mới ({df[i]['time']}): Giá {highs[i]} | {indicator} {rsi[i]:.2f}")
                         print("-" * 40)
                         divergence = {
                             "prefixIndex": old_idx,
@@ -132,7 +172,7 @@ def tim_phan_ky(df):
                         
             peaks.append(i) 
             
-        if is_trough(df, i):
+        if is_troughs[i]:
             for j in range(len(troughs) - 1, -1, -1):
                 old_idx = troughs[j]
                 
@@ -140,12 +180,12 @@ def tim_phan_ky(df):
                 if distance > 60: break
                 if distance < 10: continue
                 
-                if is_in_range(df[i]["RSI"], 'bullish') or is_in_range(df[old_idx]["RSI"], 'bullish'):
+                if is_in_range(rsi[i], 'bullish', lower, upper) or is_in_range(rsi[old_idx], 'bullish', lower, upper):
                     
-                    if df[i]["low"] < df[old_idx]["low"] and df[i]["RSI"] > df[old_idx]["RSI"]:
+                    if lows[i] < lows[old_idx] and rsi[i] > rsi[old_idx]:
                         print(f"🟢 [BULLISH] Tìm thấy Phân kỳ DƯƠNG tại dòng {i}")
-                        print(f"   - Đáy cũ ({df[old_idx]['time']}): Giá {df[old_idx]['low']} | RSI {df[old_idx]['RSI']:.2f}")
-                        print(f"   - Đáy mới ({df[i]['time']}): Giá {df[i]['low']} | RSI {df[i]['RSI']:.2f}")
+                        print(f"   - Đáy cũ ({df[old_idx]['time']}): Giá {lows[old_idx]} | {indicator} {rsi[old_idx]:.2f}")
+                        print(f"   - Đáy mới ({df[i]['time']}): Giá {lows[i]} | {indicator} {rsi[i]:.2f}")
                         print("-" * 40)     
                         divergence = {
                             "prefixIndex": old_idx,
@@ -157,78 +197,194 @@ def tim_phan_ky(df):
         
     return divergences
 
-def get_price_today(symbol: str = 'VGI'):
-    quote = Quote(symbol=symbol, source='VCI')
-    today = date.today()
-    if(today.weekday() == 5 or today.weekday() == 6):
+def fetch_intraday(symbol: str, source: str = 'VCI', interval: str = '1m') -> tuple[pd.DataFrame, int]:
+    """
+    Fetch the intraday frame of a symbol through the shared quote cache.
+
+    Returns:
+        Tuple of (frame, time it was fetched as exchange local epoch ns); a
+        cached frame can be up to QUOTE_CACHE_TTL older than now
+    """
+    def load():
+        source_limiters.get(source).acquire()
+        with vnstock_fetch_seconds.time(errors=vnstock_fetch_errors, source=source, endpoint="intraday"):
+            quote = Quote(symbol=symbol, source=source)
+            frame = quote.intraday(symbol=symbol)
+        return frame, to_ns(market_calendar.now())
+    return quote_cache.get_or_load((symbol, source, interval), load)
+
+def get_price_today(symbol: str = 'VGI') -> CandleSeries:
+    today = market_calendar.today()
+    if not market_calendar.is_trading_day(today):
         raise ValueError("Date is not a trading day")
     print(f"Getting price records on {today}...")
     try:
         # records = quote.history(start=today, end=today, interval='1m', to_df=False)
-        records = quote.intraday()
+        records, _ = fetch_intraday(symbol)
         # print("Got records: " + records)
-        records_json = records.to_json(orient='records')
-        # records_json = records
-        # print(records)
-        return records_json
+        return CandleSeries.from_frame(records)
     except Exception as e:
         print("Dit me bug " + str(e))
         raise
 
-def get_mock_price(symbol: str = 'VGI'): 
-    print("Getting mock data...")
+def closed_count(series: CandleSeries, fetched_at=None, timeframe: str = '1m') -> int:
+    """
+    Number of closed candles in `series`. The last one counts as closed
+    when the data was fetched at least WORKER_POLL_DELAY after its bar
+    ended (e.g. polled just after a bar close, or after the session);
+    otherwise, or without `fetched_at`, only once a newer candle exists.
+
+    Args:
+        fetched_at: when the candles were fetched, as anything to_ns
+            accepts (see fetch_intraday), not the current time: a cached
+            frame may predate the bar close
+    """
+    if len(series) == 0:
+        return 0
+    if fetched_at is not None:
+        ends = int(series['time'][-1]) + TIMEFRAMES[timeframe] * 10**9
+        if ends + int(WORKER_POLL_DELAY * 10**9) <= to_ns(fetched_at):
+            return len(series)
+    return len(series) - 1
+
+def store_candles(symbol: str, series: CandleSeries, fetched_at=None, interval: str = '1m'):
+    """Archive the closed candles of `series`"""
+    try:
+        written = candle_store.append(symbol, interval, series[:closed_count(series, fetched_at, interval)])
+        if written:
+            print(f"Buffered {written} new {interval} candles of {symbol} for the archive")
+    except OSError as e:
+        print(f"Could not store candles of {symbol}: {e}")
+
+def drop_warmup(series: CandleSeries) -> CandleSeries:
+    """Drop the candles whose RSI is still warming up (NaN)"""
+    rsi = series['RSI']
+    valid = ~np.isnan(rsi)
+    first = int(valid.argmax()) if valid.any() else len(series)
+    if valid[first:].all():
+        return series[first:]
+    return series.take(valid)
+
+def with_rsi(series: CandleSeries, rsi=None) -> CandleSeries:
+    """Add RSI(14) (computed here unless given) to the series, dropping the RSI warm-up candles"""
+    if rsi is None:
+        rsi = talib.RSI(series['close'], timeperiod=14)
+    return drop_warmup(series.with_column('RSI', rsi))
+
+def with_indicators(symbol: str, interval: str, series: CandleSeries, indicators=(), trim: bool = True) -> CandleSeries:
+    """
+    Add the incremental RSI (see rolling_rsi) and `indicators` of today's
+    `interval` candles. They are computed over the whole series before the
+    RSI warm-up candles, if any, are dropped (unless `trim` is False), so
+    they agree with a computation over the full day.
+    """
+    series = series.with_column('RSI', rolling_rsi(symbol, interval, series))
+    series = add_indicators(symbol, interval, series, indicators)
+    return drop_warmup(series) if trim else series
+
+def get_intraday(symbol: str = 'VGI') -> tuple[CandleSeries, int]:
+    """
+    Today's raw 1m candles; the closed ones are archived on the way.
+
+    Returns:
+        Tuple of (candles, time they were fetched), see closed_count
+    """
+    frame, fetched_at = fetch_intraday(symbol)
+    series = CandleSeries.from_frame(frame)
+    store_candles(symbol, series, fetched_at)
+    return series, fetched_at
+
+def history_closes(symbol: str, timeframe: str, before: int) -> np.ndarray:
+    """Closes of the last RSI_SEED_BARS `timeframe` bars archived before `before` (epoch ns)"""
+    step = TIMEFRAMES[timeframe]
+    # Sessions last 4.5 hours; allow for weekends and holidays
+    days = math.ceil(RSI_SEED_BARS * step / (4.5 * 3600) * 7 / 5) + 7
+    try:
+        candles = candle_store.read(symbol, '1m', before - days * NS_PER_DAY, before - 1)
+    except OSError as e:
+        print(f"Could not read archived candles of {symbol}: {e}")
+        return np.empty(0, dtype=np.float64)
+    if timeframe != '1m':
+        aggregator = BarAggregator(timeframe)
+        aggregator.update(candles)
+        candles = aggregator.bars()
+    return candles['close'][-RSI_SEED_BARS:]
+
+def rolling_rsi(symbol: str, timeframe: str, series: CandleSeries) -> np.ndarray:
+    """
+    RSI of today's `timeframe` candles of `symbol`, computed incrementally.
+    The state carries on from the archived candles of the previous days, so
+    the first candles of the day have an RSI when there is history.
+    """
+    # Only the candles closed since the last call get their RSI computed
+    state = rsi_states.get((symbol, timeframe))
+    if state is None:
+        with states_lock:
+            state = rsi_states.setdefault((symbol, timeframe), RollingRSI(
+                14, seed=lambda first: history_closes(symbol, timeframe, int(first))
+            ))
+    with state.lock, indicator_seconds.time(interval=timeframe, indicator='RSI'), indicator_symbol_seconds.time(symbol=symbol):
+        # A copy: the state's buffer is rewritten by the next call
+        return state.compute(series['time'], series['close']).copy()
 
-    quote = Quote(symbol=symbol, source='VCI') 
+def get_candles(symbol: str = 'VGI', series: CandleSeries | None = None, indicators=()) -> CandleSeries:
+    """Fetch today's candles with RSI and `indicators`, dropping the RSI warm-up candles"""
     # df = quote.history(start='2024-05-25', end='2024-05-26', interval='1m') 
-    df = quote.intraday(symbol=symbol)
-    df['RSI'] = talib.RSI(df['close'], timeperiod=14) 
-    df_filtered = df.dropna(subset=['RSI'])
-    
-    if isinstance(df_filtered.index, pd.DatetimeIndex):
-        df_filtered = df_filtered.reset_index()
-    
-    time_col = next((col for col in ['time', 'Time', 'datetime', 'date'] if col in df_filtered.columns), None)
-    if time_col:
-        df_filtered['time'] = df_filtered[time_col].astype(str)
-    else:
-        df_filtered['time'] = df_filtered.index.astype(str)
+    if series is None:
+        series, _ = get_intraday(symbol)
+    series = with_indicators(symbol, '1m', series, indicators)
+    print(f"Data loaded: {len(series)} candles.")
+    return series
 
-    records_list = df_filtered.to_dict(orient="records")
-    print(f"Data loaded: {len(records_list)} candles.")
-    
-    divergences = tim_phan_ky(records_list)
-    return records_list, divergences
-    # return df_filtered
+def get_bars(symbol: str = 'VGI', timeframe: str = '5m', partial: bool = True,
+             series: CandleSeries | None = None, fetched_at=None) -> CandleSeries:
+    """
+    Today's `timeframe` bars, aggregated incrementally from the 1m candles.
 
-def simulate_trading():
-    cur_money = 50000
-    amt_stock = 0
-    records_list, _= get_mock_price()
-    # Convert DataFrame to list of dictionaries for is_divergence function
-    # records_list= df.to_dict(orient="records")
-    n = len(records_list)
-    for i in range(n):
-        divergence = is_divergence(records_list, i)
-        if divergence is None: continue
-        if divergence["type"] == "bullish":
-            stock_price = records_list[i]["close"]
-            no_stocks = cur_money // stock_price
-            total_stock_price = stock_price * no_stocks
-            cur_money -= total_stock_price
-            amt_stock += no_stocks
-        elif divergence["type"] == "bearish":
-            stock_price = records_list[i]["close"]
-            cur_money += stock_price * amt_stock
-            amt_stock = 0
-    total_money = cur_money
-    if(n > 0):
-        total_money += amt_stock * records_list[n - 1]["close"]
-    print("End of trading day: ")
-    print("Money in the bank: " + str(cur_money))
-    print("Number of stock holding: " + str(amt_stock))
-    print("current stock price: " + (str(records_list[n - 1]["close"] if n > 0 else 0)))
-    print("total value: " + str(total_money))
-
-if __name__ == "__main__":
-    # get_mock_price()
-    simulate_trading()
\ No newline at end of file
+    Args:
+        partial: include the bar still being formed, up to the last 1m candle
+        series, fetched_at: today's raw 1m candles and their fetch time if
+            already fetched (see get_intraday)
+    """
+    if series is None:
+        series, fetched_at = get_intraday(symbol)
+    closed = closed_count(series, fetched_at)
+    aggregator = bar_aggregators.get((symbol, timeframe))
+    if aggregator is None:
+        with states_lock:
+            aggregator = bar_aggregators.setdefault((symbol, timeframe), BarAggregator(timeframe))
+    with aggregator.lock:
+        if aggregator.consumed > closed or (aggregator.consumed and series['time'][0] != aggregator.first_time):
+            # New trading day (or upstream rewrote the day): start over
+            aggregator.reset()
+        aggregator.update(series[aggregator.consumed:max(closed, 0)])
+        if partial:
+            return aggregator.bars(series[max(closed, 0):])
+        return aggregator.closed_bars()
+
+def get_history(symbol: str = 'VGI', start=None, end=None, interval: str = '1m') -> CandleSeries:
+    """
+    Read archived candles from the local store, without calling vnstock.
+
+    Args:
+        start, end: inclusive bounds, as epoch nanoseconds, datetimes or date strings
+
+    Returns:
+        The candles with RSI, computed over the requested range only
+    """
+    series = with_rsi(candle_store.read(symbol, interval, start, end))
+    print(f"History loaded: {len(series)} candles.")
+    return series
+
+def get_mock_price(symbol: str = 'VGI', indicators=('RSI',), timeframe: str = '1m'): 
+    print("Getting mock data...")
+    if timeframe == '1m':
+        series = get_candles(symbol, indicators=indicators)
+    else:
+        series = with_indicators(symbol, timeframe, get_bars(symbol, timeframe), indicators)
+    divergences = []
+    for name, lower, upper in rules_for(indicators):
+        for divergence in tim_phan_ky(series, name, lower, upper):
+            divergences.append({**divergence, "indicator": name})
+    return series, divergences
+    # return df_filtered
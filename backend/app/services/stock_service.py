@@ -5,7 +5,7 @@ from app.models.stock import Stock
 # from app.schemas.user import UserResponse, UserCreate
 from app.schemas.stock import StockCreate, StockResponse, StockUpdate
 from app.db.database import SessionLocal
-from app.services.company_service import get_all_companies
+from app.services.company_service import get_company
 from app.core.security import hash_password
 from typing import List
 from fastapi import HTTPException, status
@@ -25,27 +25,107 @@ def get_all_stocks():
     finally:
         db.close() 
 
-def create_stocks_with_symbols(symbols: list[str]):
+def normalize_symbol(symbol: str) -> str:
+    return symbol.upper().replace(" ", "")
+
+def insert_ignore_existing(db: Session, rows: list[dict]):
+    """
+    Build a multi-row INSERT into stocks that skips symbols already present,
+    returning the inserted rows where the backend supports it.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(Stock).values(rows).on_conflict_do_nothing(index_elements=["symbol"])
+    elif dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(Stock).values(rows).on_conflict_do_nothing(index_elements=["symbol"])
+    else:
+        from sqlalchemy import insert
+        stmt = insert(Stock).values(rows)
+    if dialect.insert_returning:
+        stmt = stmt.returning(Stock.id, Stock.symbol, Stock.name, Stock.summary)
+    return stmt
+
+def create_stocks_with_symbols(symbols: list[str], db: Session | None = None) -> List[StockResponse]:
+    """
+    Register many stocks at once.
+
+    Symbols already in the database are kept as they are; the missing ones
+    are looked up in the symbol directory and inserted with a single
+    multi-row INSERT.
+
+    Args:
+        symbols: Stock symbols to register
+        db: Session to run in. When given, the caller owns the transaction;
+            otherwise a session is opened and committed here.
+
+    Returns:
+        StockResponse for every requested symbol, in request order
+
+    Raises:
+        HTTPException: If a symbol is not listed on the market (409 Conflict)
+    """
     print(f"creating stocks {symbols}")
-    for symbol in symbols:
-        symbol.upper()
-        symbol.replace(" ", "")
-        df = get_all_companies()
-        api_stock = [item for item in df if item.get("symbol") == symbol] 
-        if not api_stock:
-            raise HTTPException(
-                status_code = status.HTTP_409_CONFLICT,
-                detail = f"stock {symbol} does not exists"
-            )
-        print(f"stock found is {api_stock}")
-        stock = api_stock[0]
-        create_stock(StockCreate(
-            name = stock["organ_name"],
-            symbol = stock["symbol"],
-            summary = ""
-        ))
+    symbols = list(dict.fromkeys(normalize_symbol(symbol) for symbol in symbols))
+    if not symbols:
+        return []
 
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        found = {
+            stock.symbol: (stock.id, stock.symbol, stock.name, stock.summary)
+            for stock in db.query(Stock).filter(Stock.symbol.in_(symbols))
+        }
+        rows = []
+        for symbol in symbols:
+            if symbol in found:
+                continue
+            company = get_company(symbol)
+            if not company:
+                raise HTTPException(
+                    status_code = status.HTTP_409_CONFLICT,
+                    detail = f"stock {symbol} does not exists"
+                )
+            rows.append({"symbol": company["symbol"], "name": company["organ_name"], "summary": ""})
 
+        if rows:
+            result = db.execute(insert_ignore_existing(db, rows))
+            if db.get_bind().dialect.insert_returning:
+                found.update({row.symbol: tuple(row) for row in result})
+            # Rows skipped by ON CONFLICT (a concurrent insert) or backends
+            # without RETURNING need one more lookup
+            missing = [symbol for symbol in symbols if symbol not in found]
+            if missing:
+                found.update({
+                    stock.symbol: (stock.id, stock.symbol, stock.name, stock.summary)
+                    for stock in db.query(Stock).filter(Stock.symbol.in_(missing))
+                })
+        if own_session:
+            db.commit()
+
+        return [StockResponse(
+            id = found[symbol][0],
+            symbol = found[symbol][1],
+            name = found[symbol][2],
+            summary = found[symbol][3]
+        ) for symbol in symbols]
+    except HTTPException:
+        if own_session:
+            db.rollback()
+        raise
+    except Exception as e:
+        if own_session:
+            db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating stocks: {str(e)}"
+        )
+    finally:
+        if own_session:
+            db.close()
 
 def create_stock(stock: StockCreate):
     db = SessionLocal()
@@ -68,6 +148,7 @@ def create_stock(stock: StockCreate):
         db.refresh(db_stock)
 
         return StockResponse(
+            id = db_stock.id,
             name = db_stock.name,
             symbol = db_stock.symbol,
             summary = db_stock.summary
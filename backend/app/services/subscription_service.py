@@ -0,0 +1,86 @@
+import threading
+import time
+from sqlalchemy import select
+from app.models.user import User
+from app.models.stock import Stock
+from app.models.user_stock import user_stock_association
+from app.db.database import SessionLocal, AsyncSessionLocal
+
+
+class SubscriptionIndex:
+    """
+    In-memory symbol -> subscribers index used by the worker.
+
+    Built with a single join over user_stock_association, then kept up to
+    date by add_stock_to_user / define_user_chatid so the worker never has
+    to walk every user to find out who watches what.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chat_ids = {}  # user_id -> chat_id
+        self._subscribers = {}  # symbol -> set of user_ids
+        self.loaded_at = None
+
+    @staticmethod
+    def _query():
+        return (
+            select(User.id, User.chat_id, Stock.symbol)
+            .outerjoin(user_stock_association, user_stock_association.c.user_id == User.id)
+            .outerjoin(Stock, Stock.id == user_stock_association.c.stock_id)
+        )
+
+    def load(self):
+        """Rebuild the whole index from the database"""
+        db = SessionLocal()
+        try:
+            rows = db.execute(self._query()).all()
+        finally:
+            db.close()
+        self._replace(rows)
+
+    async def load_async(self):
+        """Same as load(), for callers on the event loop"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self._query())).all()
+        self._replace(rows)
+
+    def _replace(self, rows):
+        chat_ids = {}
+        subscribers = {}
+        for user_id, chat_id, symbol in rows:
+            chat_ids[user_id] = chat_id
+            if symbol:
+                subscribers.setdefault(symbol, set()).add(user_id)
+        with self._lock:
+            self._chat_ids = chat_ids
+            self._subscribers = subscribers
+            self.loaded_at = time.monotonic()
+
+    def is_stale(self, max_age: float) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def add_stock(self, user_id: int, symbol: str):
+        with self._lock:
+            self._chat_ids.setdefault(user_id, None)
+            self._subscribers.setdefault(symbol, set()).add(user_id)
+
+    def set_chat_id(self, user_id: int, chat_id: str):
+        with self._lock:
+            self._chat_ids[user_id] = chat_id
+
+    def symbols(self) -> list[str]:
+        """Symbols watched by at least one user reachable on Telegram"""
+        with self._lock:
+            return [
+                symbol for symbol, user_ids in self._subscribers.items()
+                if any(self._chat_ids.get(user_id) for user_id in user_ids)
+            ]
+
+    def chat_ids(self, symbol: str) -> list[str]:
+        with self._lock:
+            chat_ids = (self._chat_ids.get(user_id) for user_id in self._subscribers.get(symbol, ()))
+            return [chat_id for chat_id in chat_ids if chat_id]
+
+
+subscriptions = SubscriptionIndex()
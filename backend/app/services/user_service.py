@@ -1,15 +1,24 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.models.stock import Stock
 from app.models.user_stock import user_stock_association
 from app.schemas.user import UserResponse, UserCreate
-from app.db.database import SessionLocal
+from app.db.database import SessionLocal, AsyncSessionLocal
 from app.core.security import hash_password
-from app.services.stock_service import create_stocks_with_symbols
-from typing import List
+from app.services.stock_service import create_stocks_with_symbols, normalize_symbol
+from app.services.subscription_service import subscriptions
+from app.utils.cache import TTLCache
+from app.utils.metrics import watch_cache
+from app.core.config import PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE
+from typing import AsyncIterator, Iterator, List
 from fastapi import HTTPException, status
 
+# Authenticated users by id, see get_principal. Entries must be invalidated
+# whenever something that shows up in UserResponse changes.
+principal_cache = watch_cache("principal", TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL))
+
 def get_all_users() -> List[UserResponse]:
     """
     Get all users from the database.
@@ -19,45 +28,131 @@ def get_all_users() -> List[UserResponse]:
     """
     db = SessionLocal()
     try:
-        users = db.query(User).all()
-        return [UserResponse(
-            id = user.id,
-            name=user.name,
-            email=user.email,
-            phone=user.phone,
-            chat_id=user.chat_id,
-            stocks=[str(stock.symbol) for stock in user.stocks]
-        ) for user in users]
+        # Load every user's stocks in one extra query instead of one per user
+        users = db.query(User).options(selectinload(User.stocks)).order_by(User.id).all()
+        return [to_user_response(user) for user in users]
     finally:
         db.close()
+
+def get_users_page(after_id: int = 0, limit: int = 100) -> List[UserResponse]:
+    """
+    Get one page of users ordered by id, keyset-paginated.
+
+    Args:
+        after_id: Only users with an id greater than this are returned;
+            pass the id of the last user of the previous page
+        limit: Maximum number of users in the page
+    """
+    db = SessionLocal()
+    try:
+        users = (
+            db.query(User)
+            .options(selectinload(User.stocks))
+            .filter(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+            .all()
+        )
+        return [to_user_response(user) for user in users]
+    finally:
+        db.close()
+
+def iter_users(batch_size: int = 500, after_id: int = 0) -> Iterator[UserResponse]:
+    """
+    Stream all users (with an id greater than `after_id`) page by page so
+    only `batch_size` of them are held at once.
+    """
+    while True:
+        page = get_users_page(after_id=after_id, limit=batch_size)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after_id = page[-1].id
+
+async def get_users_page_async(after_id: int = 0, limit: int = 100) -> List[UserResponse]:
+    """
+    Same as get_users_page, for callers on the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(User)
+            .options(selectinload(User.stocks))
+            .where(User.id > after_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return [to_user_response(user) for user in result.scalars()]
+
+async def iter_users_async(batch_size: int = 500) -> AsyncIterator[UserResponse]:
+    after_id = 0
+    while True:
+        page = await get_users_page_async(after_id=after_id, limit=batch_size)
+        for user in page:
+            yield user
+        if len(page) < batch_size:
+            return
+        after_id = page[-1].id
+
+def to_user_response(user: User) -> UserResponse:
+    return UserResponse(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        phone=user.phone,
+        chat_id=user.chat_id,
+        stocks=[str(stock.symbol) for stock in user.stocks]
+    )
     
 def get_by_id(id: str) -> UserResponse | None:
     db = SessionLocal()
     try:
-        user = db.query(User).filter(User.id == id).first()
+        user = db.query(User).options(selectinload(User.stocks)).filter(User.id == id).first()
         if not user:
             return None
-        return UserResponse(
-            id= user.id,
-            name=user.name,
-            email=user.email,
-            chat_id=user.chat_id,
-            phone=user.phone,
-            hash_password=user.password_hash,
-            stocks=[str(stock.symbol) for stock in user.stocks]
+        return to_user_response(user)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error fetching user id {id}: {str(e)}"
         )
+    finally:
+        db.close()
+
+def get_principal(id: int) -> UserResponse | None:
+    """
+    Resolve the user behind a token, served from principal_cache when possible.
+    """
+    # Unknown ids are not cached: the user may be created right after
+    return principal_cache.get_or_load(int(id), lambda: get_by_id(id), cache_none=False)
+
+async def get_by_id_async(id: int) -> UserResponse | None:
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User).options(selectinload(User.stocks)).where(User.id == int(id))
+            )
+            user = result.scalar_one_or_none()
+            return to_user_response(user) if user else None
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error fetching user id {id}: {str(e)}"
         )
 
-def create_user(user: UserCreate) -> UserResponse:
+async def get_principal_async(id: int) -> UserResponse | None:
+    """
+    Same as get_principal, for callers on the event loop.
+    """
+    return await principal_cache.get_or_load_async(int(id), lambda: get_by_id_async(id), cache_none=False)
+
+def create_user(user: UserCreate, password_hash: str | None = None) -> UserResponse:
     """
     Create a new user in the database.
     
     Args:
         user: UserCreate schema with user data
+        password_hash: bcrypt hash of user.password, when the caller already
+            computed it off-thread; hashed inline otherwise
         
     Returns:
         UserResponse object with created user data
@@ -81,7 +176,7 @@ def create_user(user: UserCreate) -> UserResponse:
             name=user.name,
             email=user.email,
             phone=user.phone,
-            password_hash=hash_password(user.password)
+            password_hash=password_hash or hash_password(user.password)
         )
         
         # Add to database
@@ -91,6 +186,7 @@ def create_user(user: UserCreate) -> UserResponse:
         
         # Convert to response schema
         return UserResponse(
+            id=db_user.id,
             name=db_user.name,
             email=db_user.email,
             phone=db_user.phone,
@@ -123,34 +219,44 @@ def add_stock_to_user(user_id: int, stock_symbol: str) -> UserResponse:
         user_id: The ID of the user to add the stock to
         stock_symbol: The symbol of the stock to add
     """
+    return add_stocks_to_user(user_id, [stock_symbol])
+
+def add_stocks_to_user(user_id: int, stock_symbols: list[str]) -> UserResponse:
+    """
+    Add many stocks to a user's portfolio in one transaction.
+
+    Stocks missing from the database are registered in bulk and all the new
+    links are written with a single multi-row INSERT.
+
+    Args:
+        user_id: The ID of the user to add the stocks to
+        stock_symbols: The symbols of the stocks to add
+    """
     db = SessionLocal()
     try:
         user = db.query(User).filter(User.id == user_id).first()
-        stock = db.query(Stock).filter(Stock.symbol == stock_symbol).first()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"User with id {user_id} not found"
             )
-        
-        if [s for s in user.stocks if s.symbol == stock_symbol]:
-            stocks_str = [s.symbol for s in user.stocks]
-            return UserResponse(
-                id=user.id,
-                name=user.name,
-                email=user.email,
-                phone=user.phone,
-                chat_id=user.chat_id,
-                stocks=stocks_str
-            )
 
-        if not stock:
-            stock = create_stocks_with_symbols([stock_symbol])
+        owned = {s.symbol for s in user.stocks}
+        symbols = [symbol for symbol in dict.fromkeys(normalize_symbol(s) for s in stock_symbols) if symbol not in owned]
+        if symbols:
+            stocks = create_stocks_with_symbols(symbols, db=db)
+            # .values() with a list compiles to one INSERT ... VALUES (...), (...)
+            db.execute(
+                user_stock_association.insert().values(
+                    [{"user_id": user.id, "stock_id": stock.id} for stock in stocks]
+                )
+            )
+            db.commit()
+            db.refresh(user)
+            for stock in stocks:
+                subscriptions.add_stock(user.id, stock.symbol)
+            principal_cache.invalidate(user.id)
 
-        stmt = user_stock_association.insert().values(user_id=user.id, stock_id=stock.id)
-        db.execute(stmt)
-        db.commit() 
-        db.refresh(user)
         stocks_str = [s.symbol for s in user.stocks]
         return UserResponse(
             id=user.id,
@@ -160,6 +266,10 @@ def add_stock_to_user(user_id: int, stock_symbol: str) -> UserResponse:
             chat_id=user.chat_id,
             stocks=stocks_str
         )
+    except HTTPException:
+        # e.g. 409 for a symbol that is not listed
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -181,9 +291,35 @@ def define_user_chatid(user_id: int, chat_id: str):
         user.chat_id = chat_id
         db.commit()
         db.refresh(user)
+        subscriptions.set_chat_id(user.id, chat_id)
+        principal_cache.invalidate(user.id)
         return user
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error assigning chat id to user {user_id}: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+async def define_user_chatid_async(user_id: int, chat_id: str):
+    """
+    Same as define_user_chatid, for callers on the event loop.
+    """
+    chat_id = str(chat_id)
+    try:
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, int(user_id))
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"User with id {user_id} not found"
+                )
+            user.chat_id = chat_id
+            await db.commit()
+        subscriptions.set_chat_id(user.id, chat_id)
+        principal_cache.invalidate(user.id)
+        return user
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error assigning chat id to user {user_id}: {str(e)}"
+        )
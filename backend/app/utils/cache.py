@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    Thread-safe cache with a per-entry TTL and an LRU size bound.
+
+    get_or_load() also coalesces concurrent misses: while a key is being
+    loaded, other callers asking for it wait on the same in-flight load
+    instead of starting their own.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future of the load in progress
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= now:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, entry[1]
+
+    def _store(self, key, value, now):
+        self._data[key] = (now + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            # A load already running may have read the old value: let it
+            # finish for its callers but don't let it store the result
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._inflight.clear()
+
+    def _begin(self, key):
+        """(found, value, future, leader) for a lookup of `key`"""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return True, value, None, False
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+            return False, None, future, leader
+
+    def _finish(self, key, future: Future, value=None, error: BaseException | None = None, cache_none: bool = True):
+        with self._lock:
+            current = self._inflight.get(key) is future
+            if current:
+                del self._inflight[key]
+                if error is None and (cache_none or value is not None):
+                    self._store(key, value, time.monotonic())
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def get_or_load(self, key, loader, cache_none: bool = True):
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+
+        Only one loader runs per key at a time; its result (or exception) is
+        shared with every caller that missed while it was running. With
+        `cache_none=False` a None result is returned but not cached.
+        """
+        found, value, future, leader = self._begin(key)
+        if found:
+            return value
+        if not leader:
+            return future.result()
+        try:
+            value = loader()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value, cache_none=cache_none)
+        return value
+
+    async def get_or_load_async(self, key, loader, cache_none: bool = True):
+        """
+        get_or_load for callers on the event loop: `loader()` returns an
+        awaitable, and waiting for another caller's load doesn't block the
+        loop. Loads are shared with get_or_load callers of the same key.
+        """
+        found, value, future, leader = self._begin(key)
+        if found:
+            return value
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value, cache_none=cache_none)
+        return value
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.coalesced) / requests if requests else 0.0,
+        }
@@ -0,0 +1,243 @@
+import threading
+import numpy as np
+import pandas as pd
+
+TIME_COLUMNS = ['time', 'Time', 'datetime', 'date']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+class CandleSeries:
+    """
+    Array-backed candle series.
+
+    Every field is stored as one contiguous column: "time" as int64
+    nanoseconds since the epoch (exchange local time), "volume" as int64 and
+    prices, "RSI" and any other indicator as float64. Slicing returns a new
+    series viewing the same buffers, so windows cost nothing to take.
+
+    Indexing:
+        series[i]       -> dict for candle i, shaped like the old records
+        series[a:b]     -> CandleSeries (zero-copy)
+        series["high"]  -> the column array
+    """
+
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: dict):
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        """Build a series from a vnstock OHLCV DataFrame"""
+        if isinstance(df.index, pd.DatetimeIndex):
+            df = df.reset_index()
+        time_col = next((col for col in TIME_COLUMNS if col in df.columns), None)
+        times = df[time_col] if time_col else df.index.to_series()
+        columns = {"time": to_epoch_ns(times)}
+        for col in PRICE_COLUMNS:
+            columns[col] = df[col].to_numpy(dtype=np.float64)
+        columns["volume"] = df["volume"].fillna(0).to_numpy(dtype=np.int64)
+        if "RSI" in df.columns:
+            columns["RSI"] = df["RSI"].to_numpy(dtype=np.float64)
+        return cls(columns)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a series from a list of candle dicts"""
+        return cls.from_frame(pd.DataFrame.from_records(records))
+
+    @classmethod
+    def empty(cls):
+        columns = {"time": np.empty(0, dtype=np.int64)}
+        for col in PRICE_COLUMNS:
+            columns[col] = np.empty(0, dtype=np.float64)
+        columns["volume"] = np.empty(0, dtype=np.int64)
+        columns["RSI"] = np.empty(0, dtype=np.float64)
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, parts):
+        """Join consecutive series (copies); columns are those of the first part"""
+        if not parts:
+            return cls.empty()
+        return cls({name: np.concatenate([part[name] for part in parts]) for name in parts[0].columns})
+
+    def __len__(self):
+        return len(self.columns["time"])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return CandleSeries({name: col[key] for name, col in self.columns.items()})
+        row = {name: col[key].item() for name, col in self.columns.items()}
+        row["time"] = format_time(row["time"])
+        return row
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def with_column(self, name: str, values):
+        """Return a series sharing these columns plus `name`"""
+        columns = dict(self.columns)
+        columns[name] = np.asarray(values, dtype=np.float64)
+        return CandleSeries(columns)
+
+    def after(self, cursor) -> "CandleSeries":
+        """Candles strictly after `cursor` (epoch ns, datetime or time string), zero-copy"""
+        return self[int(np.searchsorted(self.columns["time"], to_ns(cursor), side="right")):]
+
+    def take(self, mask):
+        """Return the candles selected by a boolean mask or index array (copies)"""
+        return CandleSeries({name: col[mask] for name, col in self.columns.items()})
+
+    def to_columns(self) -> dict:
+        """Columnar JSON-ready layout: one list per field"""
+        columns = {name: col.tolist() for name, col in self.columns.items()}
+        columns["time"] = format_times(self.columns["time"])
+        return columns
+
+    def to_records(self) -> list[dict]:
+        """Row layout matching what to_dict(orient="records") used to return"""
+        columns = self.to_columns()
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def as_series(df) -> CandleSeries:
+    """Accept either a CandleSeries or a list of candle records"""
+    if isinstance(df, CandleSeries):
+        return df
+    if len(df) == 0:
+        return CandleSeries.empty()
+    return CandleSeries.from_records(df)
+
+
+def to_epoch_ns(times) -> np.ndarray:
+    times = pd.to_datetime(pd.Series(times).reset_index(drop=True))
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert("Asia/Ho_Chi_Minh").dt.tz_localize(None)
+    return times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def to_ns(value) -> int | None:
+    """
+    Accept epoch nanoseconds (also as a digit string, e.g. a `next_since`
+    passed back), a datetime or a date string. Like candle times, the result
+    is naive Asia/Ho_Chi_Minh time: tz-aware values are converted first.
+    """
+    if value is None or isinstance(value, (int, np.integer)):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert("Asia/Ho_Chi_Minh").tz_localize(None)
+    return stamp.value
+
+
+def format_time(value: int) -> str:
+    return str(pd.Timestamp(value))
+
+
+def format_times(values: np.ndarray) -> list[str]:
+    return pd.to_datetime(values).astype(str).tolist()
+
+
+# Bar length of each supported timeframe, in seconds
+TIMEFRAMES = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600}
+BAR_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+
+class BarAggregator:
+    """
+    Builds `timeframe` OHLCV bars from closed base candles, incrementally.
+
+    Bars are aligned on the clock (09:00, 09:05, ... for 5m). A bar is
+    complete once the base candle covering its last interval has been fed,
+    or as soon as a candle of a later bar arrives (gaps, lunch break). Each
+    update() only touches the new candles; `lock` serializes callers
+    sharing an aggregator.
+    """
+
+    def __init__(self, timeframe: str, base: str = "1m"):
+        self.lock = threading.Lock()
+        self.timeframe = timeframe
+        self.step = TIMEFRAMES[timeframe] * 10**9
+        self.base_step = TIMEFRAMES[base] * 10**9
+        self.reset()
+
+    def reset(self):
+        self.consumed = 0  # base candles fed so far
+        self.first_time = None
+        self._closed = tuple([] for _ in BAR_COLUMNS)
+        self._current = None  # [start, open, high, low, close, volume] of the bar in progress
+
+    def update(self, candles) -> int:
+        """
+        Feed closed base candles, oldest first.
+
+        Returns:
+            Number of bars completed by these candles
+        """
+        completed = len(self._closed[0])
+        columns = [candles[name].tolist() for name in BAR_COLUMNS]
+        if self.first_time is None and len(candles):
+            self.first_time = columns[0][0]
+        for time, open, high, low, close, volume in zip(*columns):
+            start = time - time % self.step
+            if self._current is not None and self._current[0] != start:
+                self._close()
+            bar = self._current
+            if bar is None:
+                self._current = [start, open, high, low, close, volume]
+            else:
+                bar[2] = max(bar[2], high)
+                bar[3] = min(bar[3], low)
+                bar[4] = close
+                bar[5] += volume
+            if time + self.base_step >= start + self.step:
+                self._close()
+        self.consumed += len(candles)
+        return len(self._closed[0]) - completed
+
+    def _close(self):
+        for column, value in zip(self._closed, self._current):
+            column.append(value)
+        self._current = None
+
+    def closed_bars(self) -> CandleSeries:
+        return self._series(self._closed)
+
+    def bars(self, forming=None) -> CandleSeries:
+        """
+        Completed bars followed by the bar in progress, if any.
+
+        Args:
+            forming: the still open base candle (CandleSeries of length 0 or 1),
+                merged into the bar in progress without being consumed
+        """
+        closed = self._closed
+        current = list(self._current) if self._current is not None else None
+        if forming is not None and len(forming):
+            time, open, high, low, close, volume = (forming[name][0].item() for name in BAR_COLUMNS)
+            start = time - time % self.step
+            if current is not None and current[0] != start:
+                # The forming candle already belongs to the next bar
+                closed = tuple(col + [value] for col, value in zip(closed, current))
+                current = None
+            if current is None:
+                current = [start, open, high, low, close, volume]
+            else:
+                current = [start, current[1], max(current[2], high), min(current[3], low), close, current[5] + volume]
+        return self._series(closed, current)
+
+    @staticmethod
+    def _series(columns, extra=None) -> CandleSeries:
+        if extra is not None:
+            columns = tuple(col + [value] for col, value in zip(columns, extra))
+        series = {}
+        for name, values in zip(BAR_COLUMNS, columns):
+            dtype = np.int64 if name in ("time", "volume") else np.float64
+            series[name] = np.array(values, dtype=dtype)
+        return CandleSeries(series)
@@ -0,0 +1,209 @@
+import math
+import threading
+import numpy as np
+import talib
+
+
+class RSIState:
+    """
+    Incremental Wilder RSI, matching talib.RSI.
+
+    The first `period` price changes are averaged to seed the smoothed
+    average gain/loss; after that every close updates them in O(1):
+        avg = (avg * (period - 1) + change) / period
+    Values before the seed is complete are NaN, like talib's lookback.
+    """
+
+    __slots__ = ("period", "prev_close", "avg_gain", "avg_loss", "count")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.prev_close = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0  # price changes consumed
+
+    def _next(self, close: float):
+        """(avg_gain, avg_loss, ready) after `close`"""
+        change = close - self.prev_close
+        gain, loss = (change, 0.0) if change > 0 else (0.0, -change)
+        period = self.period
+        if self.count < period:
+            # Seeding: avg_gain/avg_loss hold plain sums until the window is full
+            avg_gain, avg_loss = self.avg_gain + gain, self.avg_loss + loss
+            if self.count + 1 < period:
+                return avg_gain, avg_loss, False
+            return avg_gain / period, avg_loss / period, True
+        return (
+            (self.avg_gain * (period - 1) + gain) / period,
+            (self.avg_loss * (period - 1) + loss) / period,
+            True,
+        )
+
+    @staticmethod
+    def _value(avg_gain: float, avg_loss: float) -> float:
+        total = avg_gain + avg_loss
+        # talib treats |total| < 1e-8 as zero and outputs 0
+        if -1e-8 < total < 1e-8:
+            return 0.0
+        return 100.0 * avg_gain / total
+
+    def update(self, close: float) -> float:
+        """Consume the next close and return its RSI (NaN during warm-up)"""
+        if self.prev_close is None:
+            self.prev_close = close
+            return math.nan
+        self.avg_gain, self.avg_loss, ready = self._next(close)
+        self.prev_close = close
+        self.count += 1
+        return self._value(self.avg_gain, self.avg_loss) if ready else math.nan
+
+    def update_many(self, closes) -> np.ndarray:
+        return np.array([self.update(close) for close in np.asarray(closes, dtype=np.float64).tolist()])
+
+    def peek(self, close: float) -> float:
+        """RSI `close` would get as the next value, without consuming it"""
+        if self.prev_close is None:
+            return math.nan
+        avg_gain, avg_loss, ready = self._next(close)
+        return self._value(avg_gain, avg_loss) if ready else math.nan
+
+
+class RollingRSI:
+    """
+    RSI of an intraday series that grows between fetches.
+
+    Every candle but the last is final, so their RSI is computed once and
+    kept; each call only consumes the candles closed since the previous one
+    and peeks at the still forming last candle. If the series does not
+    extend the previous one (new day, upstream revision) it starts over,
+    from the closes `seed(first time)` returns if given (e.g. the previous
+    days' candles) so the RSI does not warm up again every day.
+
+    Values live in a preallocated buffer that doubles when full, so a call
+    costs O(new candles) amortized. The array compute() returns is that
+    buffer, rewritten by the next call: copy it while holding `lock`, which
+    serializes callers sharing a state.
+    """
+
+    def __init__(self, period: int = 14, capacity: int = 256, seed=None):
+        self.state = RSIState(period)
+        self.capacity = capacity
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.state.reset()
+        self._buffer = np.empty(self.capacity, dtype=np.float64)
+        self.size = 0  # final values in the buffer
+        self.first_time = None
+        self.last_time = None
+        self.last_close = None
+
+    @property
+    def values(self) -> np.ndarray:
+        """RSI of the closed candles consumed so far"""
+        return self._buffer[:self.size]
+
+    def _reserve(self, size: int):
+        if size > len(self._buffer):
+            buffer = np.empty(max(size, 2 * len(self._buffer)), dtype=np.float64)
+            buffer[:self.size] = self._buffer[:self.size]
+            self._buffer = buffer
+
+    def compute(self, times: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        final = len(closes) - 1
+        if final < 0:
+            return np.empty(0, dtype=np.float64)
+        done = self.size
+        if self.first_time is not None and (
+            done > final or times[0] != self.first_time
+            or done and (times[done - 1] != self.last_time or closes[done - 1] != self.last_close)
+        ):
+            self.reset()
+            done = 0
+        if self.first_time is None:
+            self.first_time = times[0]
+            if self.seed is not None:
+                for close in np.asarray(self.seed(times[0]), dtype=np.float64).tolist():
+                    self.state.update(close)
+        self._reserve(final + 1)
+        if final > done:
+            update = self.state.update
+            buffer = self._buffer
+            for i, close in enumerate(np.asarray(closes[done:final], dtype=np.float64).tolist(), done):
+                buffer[i] = update(close)
+            self.size = final
+            self.last_time = times[final - 1]
+            self.last_close = closes[final - 1]
+        self._buffer[final] = self.state.peek(float(closes[final]))
+        return self._buffer[:final + 1]
+
+
+class Indicator:
+    """
+    A named indicator computed from a CandleSeries.
+
+    `lower`/`upper` are the oscillator's default oversold/overbought zones
+    used by divergence rules; None means the indicator has no fixed zones.
+    """
+
+    def __init__(self, name: str, compute, lower=None, upper=None):
+        self.name = name
+        self.compute = compute
+        self.lower = lower
+        self.upper = upper
+
+
+INDICATORS: dict[str, Indicator] = {}
+
+
+def register(name: str, lower=None, upper=None):
+    """Declare an indicator: `func(series) -> np.ndarray` aligned with the candles"""
+    def decorator(func):
+        INDICATORS[name] = Indicator(name, func, lower, upper)
+        return func
+    return decorator
+
+
+@register("RSI", lower=35, upper=65)
+def rsi(series):
+    return talib.RSI(series['close'], timeperiod=14)
+
+
+@register("MACD_HIST")
+def macd_hist(series):
+    return talib.MACD(series['close'], fastperiod=12, slowperiod=26, signalperiod=9)[2]
+
+
+@register("STOCH_K", lower=20, upper=80)
+def stoch_k(series):
+    return talib.STOCH(series['high'], series['low'], series['close'],
+                       fastk_period=14, slowk_period=3, slowd_period=3)[0]
+
+
+@register("OBV")
+def obv(series):
+    return talib.OBV(series['close'], series['volume'].astype(np.float64))
+
+
+def parse_rules(spec: str) -> list[tuple[str, float | None, float | None]]:
+    """
+    Parse "RSI,STOCH_K:25:75" into (indicator, lower, upper) rules; the
+    zones default to the indicator's own.
+    """
+    rules = []
+    for item in spec.split(","):
+        name, *zones = item.strip().split(":")
+        if not name:
+            continue
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator {name}")
+        indicator = INDICATORS[name]
+        lower, upper = (float(z) for z in zones) if zones else (indicator.lower, indicator.upper)
+        rules.append((name, lower, upper))
+    return rules
@@ -0,0 +1,228 @@
+"""
+Vietnamese exchange calendar: trading sessions and market holidays.
+
+All times are exchange local time (Asia/Ho_Chi_Minh, UTC+7 all year).
+HOSE opens with the ATO auction at 9:00, trades continuously until the
+11:30 lunch break and again from 13:00, and closes with the ATC auction
+14:30-14:45. HNX trades continuously from 9:00, has its ATC 14:30-14:45
+and a post-close session until 15:00; UPCoM trades continuously until
+15:00. Orders are only matched in these sessions, so polling outside of
+them only returns what is already known.
+"""
+import logging
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from app.core.config import MARKET_EXCHANGES, MARKET_HOLIDAYS, MARKET_HOURS_ONLY
+
+try:
+    from zoneinfo import ZoneInfo
+    VN_TZ = ZoneInfo("Asia/Ho_Chi_Minh")
+except Exception:
+    # No tz database (e.g. Windows without tzdata); Vietnam has no DST
+    VN_TZ = timezone(timedelta(hours=7), "ICT")
+
+# exchange -> [(session, start, end)], in order
+EXCHANGE_SESSIONS = {
+    "HOSE": [
+        ("ATO", time(9, 0), time(9, 15)),
+        ("continuous", time(9, 15), time(11, 30)),
+        ("continuous", time(13, 0), time(14, 30)),
+        ("ATC", time(14, 30), time(14, 45)),
+    ],
+    "HNX": [
+        ("continuous", time(9, 0), time(11, 30)),
+        ("continuous", time(13, 0), time(14, 30)),
+        ("ATC", time(14, 30), time(14, 45)),
+        ("PLO", time(14, 45), time(15, 0)),
+    ],
+    "UPCOM": [
+        ("continuous", time(9, 0), time(11, 30)),
+        ("continuous", time(13, 0), time(15, 0)),
+    ],
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _days(first: str, last: str | None = None) -> list[date]:
+    start = date.fromisoformat(first)
+    end = date.fromisoformat(last) if last else start
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+# Weekday market closures announced by the exchanges. Check each year's
+# announcement (Tet and the compensatory days move) and override with
+# MARKET_HOLIDAYS when it differs or a year is missing: a year without any
+# holiday listed is treated as all trading days, which is logged as a
+# warning (see MarketCalendar.check_holidays).
+HOLIDAYS = frozenset(
+    # 2025
+    _days("2025-01-01")
+    + _days("2025-01-27", "2025-01-31")  # Tet
+    + _days("2025-04-07")  # Hung Kings
+    + _days("2025-04-30", "2025-05-02")  # Reunification Day, Labour Day
+    + _days("2025-09-01", "2025-09-02")  # National Day
+    # 2026
+    + _days("2026-01-01")
+    + _days("2026-02-16", "2026-02-20")  # Tet
+    + _days("2026-04-27")  # Hung Kings (falls on Sunday 26/4)
+    + _days("2026-04-30", "2026-05-01")  # Reunification Day, Labour Day
+    + _days("2026-09-01", "2026-09-02")  # National Day
+)
+
+
+def parse_holidays(spec: str) -> frozenset[date]:
+    """Parse "2026-01-01,2026-02-16..2026-02-20" into a set of dates"""
+    days = []
+    for item in spec.split(","):
+        item = item.strip()
+        if item:
+            days.extend(_days(*item.split("..", 1)))
+    return frozenset(days)
+
+
+class MarketCalendar:
+    """
+    Trading days and sessions of a set of exchanges.
+
+    The market counts as open when any of the exchanges is in a session;
+    `next_poll()` turns that into a polling schedule aligned to bar closes.
+    """
+
+    def __init__(self, exchanges=("HOSE", "HNX", "UPCOM"), holidays=HOLIDAYS, tz=VN_TZ):
+        unknown = [name for name in exchanges if name not in EXCHANGE_SESSIONS]
+        if unknown:
+            raise ValueError(f"Unknown exchanges {unknown}, expected some of {list(EXCHANGE_SESSIONS)}")
+        self.exchanges = tuple(exchanges)
+        self.holidays = frozenset(holidays)
+        self.years = frozenset(day.year for day in self.holidays)
+        self._warned = set()
+        self.tz = tz
+        self.windows = self._merge([
+            (start, end) for name in self.exchanges for _, start, end in EXCHANGE_SESSIONS[name]
+        ])
+
+    @staticmethod
+    def _merge(spans):
+        """Union of (start, end) time spans, as sorted disjoint spans"""
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def today(self) -> date:
+        return self.now().date()
+
+    def _local(self, when: datetime | None) -> datetime:
+        if when is None:
+            return self.now()
+        if when.tzinfo is None:
+            return when.replace(tzinfo=self.tz)
+        return when.astimezone(self.tz)
+
+    def check_holidays(self, day: date | None = None) -> bool:
+        """
+        Whether the holidays of `day`'s year (default: this year) are known;
+        logs a warning, once per year, when they are not.
+        """
+        year = (day or self.today()).year
+        if year in self.years:
+            return True
+        if year not in self._warned:
+            self._warned.add(year)
+            logger.warning(
+                f"No market holidays known for {year}: every weekday counts as a trading day. "
+                f"Set MARKET_HOLIDAYS to that year's closures (e.g. {year}-01-01,...)"
+            )
+        return False
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def sessions(self, when: datetime | None = None) -> dict[str, str]:
+        """exchange -> session ("ATO", "continuous", "ATC", "PLO") in progress at `when`"""
+        when = self._local(when)
+        if not self.is_trading_day(when.date()):
+            return {}
+        now = when.time()
+        active = {}
+        for name in self.exchanges:
+            for session, start, end in EXCHANGE_SESSIONS[name]:
+                if start <= now < end:
+                    active[name] = session
+        return active
+
+    def is_open(self, when: datetime | None = None) -> bool:
+        when = self._local(when)
+        if not self.is_trading_day(when.date()):
+            return False
+        return any(start <= when.time() < end for start, end in self.windows)
+
+    def next_open(self, when: datetime | None = None) -> datetime:
+        """`when` itself if the market is open, else the start of the next session"""
+        when = self._local(when)
+        if self.is_open(when):
+            return when
+        day = when.date()
+        for _ in range(366):
+            if self.is_trading_day(day):
+                for start, _ in self.windows:
+                    opens = datetime.combine(day, start, self.tz)
+                    if opens > when:
+                        return opens
+            day += timedelta(days=1)
+        raise ValueError("No trading session within a year")
+
+    def next_poll(self, when: datetime | None = None, interval: float = 60, delay: float = 0) -> datetime:
+        """
+        The next time after `when` to poll bars of `interval` seconds.
+
+        Polls fall `delay` seconds after each bar close within a session,
+        bar closes being multiples of `interval` since midnight; the close
+        of a session counts, so the last bar before lunch and the close is
+        polled too. Outside of sessions this is the first bar close of the
+        next session.
+        """
+        when = self._local(when)
+        day = when.date()
+        for _ in range(366):
+            if self.is_trading_day(day):
+                midnight = datetime.combine(day, time(0), self.tz)
+                for start, end in self.windows:
+                    lo = max(datetime.combine(day, start, self.tz), when - timedelta(seconds=delay))
+                    # First bar close strictly after `lo`
+                    seconds = (lo - midnight).total_seconds()
+                    close = (math.floor(seconds / interval) + 1) * interval
+                    if midnight + timedelta(seconds=close) <= datetime.combine(day, end, self.tz):
+                        self.check_holidays(day)
+                        return midnight + timedelta(seconds=close + delay)
+            day += timedelta(days=1)
+        raise ValueError("No trading session within a year")
+
+    def seconds_until_poll(self, interval: float = 60, delay: float = 0, when: datetime | None = None) -> float:
+        when = self._local(when)
+        return max((self.next_poll(when, interval, delay) - when).total_seconds(), 0.0)
+
+
+market_calendar = MarketCalendar(
+    [name.strip().upper() for name in MARKET_EXCHANGES.split(",") if name.strip()],
+    parse_holidays(MARKET_HOLIDAYS) if MARKET_HOLIDAYS.strip() else HOLIDAYS,
+)
+
+
+def seconds_until_next_poll(interval: float, delay: float = 0) -> float:
+    """
+    How long a poller running every `interval` seconds should sleep: until
+    the next bar close (plus `delay`) in session, or until the next
+    session when the market is closed. Without MARKET_HOURS_ONLY it simply
+    polls every `interval` seconds.
+    """
+    if not MARKET_HOURS_ONLY:
+        return interval
+    return market_calendar.seconds_until_poll(interval, delay)
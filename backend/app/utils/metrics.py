@@ -0,0 +1,287 @@
+"""
+Process metrics in the Prometheus text exposition format.
+
+A small in-process registry of counters, gauges, histograms and summaries
+with labels; render() produces what GET /metrics serves. Hot paths time
+themselves with `histogram.time(**labels)`, usable as a context manager or
+a decorator:
+
+    with vnstock_fetch_seconds.time(source="VCI", endpoint="intraday"):
+        ...
+
+A histogram exports a series per bucket for every label combination, so
+high cardinality labels (one per symbol) go to a Summary instead, which
+only exports the sum and count.
+
+Values owned by another object (cache hit counts, pool sizes, queue
+depths) are not copied on every change: give the metric a `collect`
+function and it is read at scrape time instead.
+"""
+import math
+import threading
+import time
+from contextlib import ContextDecorator
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> metric, in registration order
+registry: dict[str, "Metric"] = {}
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels=(), collect=None):
+        """
+        Args:
+            labels: label names; every sample must give a value for each
+            collect: optional `() -> {label values tuple: value}` read at
+                scrape time instead of the values recorded here
+        """
+        if name in registry:
+            raise ValueError(f"Metric {name} is already registered")
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """(suffix, label values, extra label, value) for each sample"""
+        values = self.collect() if self.collect is not None else self._snapshot()
+        for key, value in values.items():
+            yield "", key, "", value
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {escape(self.help)}", f"# TYPE {self.name} {self.type}"]
+        try:
+            samples = list(self.samples())
+        except Exception as e:
+            # A broken collector must not take the whole scrape down
+            print(f"Error collecting metric {self.name}: {e}")
+            samples = []
+        for suffix, key, extra, value in samples:
+            lines.append(f"{self.name}{suffix}{format_labels(self.labels, key, extra)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Timer(ContextDecorator):
+    """Observes the seconds spent in its block; counts `errors` on exceptions"""
+
+    def __init__(self, metric: "Histogram | Summary", labels: dict, errors: Counter | None = None):
+        self.metric = metric
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        self.metric.observe(self.elapsed, **self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(**self.labels)
+        return False
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (not cumulative), sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def time(self, errors: Counter | None = None, **labels) -> Timer:
+        """Time a block or function into this histogram"""
+        return Timer(self, labels, errors)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield "_bucket", key, f'le="{format_value(bound)}"', cumulative
+            yield "_bucket", key, 'le="+Inf"', count
+            yield "_sum", key, "", total
+            yield "_count", key, "", count
+
+
+class Summary(Metric):
+    """Sum and count of observations, without quantiles: two series per label set"""
+
+    type = "summary"
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0, 0]
+            state[0] += value
+            state[1] += 1
+
+    def time(self, errors: Counter | None = None, **labels) -> Timer:
+        """Time a block or function into this summary"""
+        return Timer(self, labels, errors)
+
+    def samples(self):
+        with self._lock:
+            values = {key: tuple(state) for key, state in self._values.items()}
+        for key, (total, count) in values.items():
+            yield "_sum", key, "", total
+            yield "_count", key, "", count
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format"""
+    lines = []
+    for metric in list(registry.values()):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Upstream and analysis timings
+vnstock_fetch_seconds = Histogram(
+    "vnstock_fetch_seconds", "Duration of vnstock upstream calls", ("source", "endpoint")
+)
+vnstock_fetch_errors = Counter(
+    "vnstock_fetch_errors_total", "vnstock upstream calls that raised", ("source", "endpoint")
+)
+indicator_seconds = Histogram(
+    "indicator_compute_seconds", "Time computing an indicator column", ("interval", "indicator")
+)
+indicator_symbol_seconds = Summary(
+    "indicator_compute_symbol_seconds", "Time computing indicator columns, per symbol", ("symbol",)
+)
+divergence_seconds = Histogram(
+    "divergence_detect_seconds", "Time feeding new candles to the divergence detectors", ("timeframe",)
+)
+divergence_symbol_seconds = Summary(
+    "divergence_detect_symbol_seconds", "Time feeding new candles to the divergence detectors, per symbol", ("symbol",)
+)
+
+# Background worker
+worker_tick_seconds = Histogram(
+    "worker_tick_seconds", "Duration of one stock worker pass over every subscribed symbol"
+)
+worker_tick_lag = Gauge(
+    "worker_tick_lag_seconds", "How late the last stock worker tick started after the bar close poll it was scheduled for"
+)
+worker_skipped_polls = Counter(
+    "worker_skipped_polls_total", "Scheduled stock worker polls skipped because a tick overran"
+)
+worker_symbol_errors = Counter(
+    "worker_symbol_errors_total", "Symbols whose processing failed in a worker tick", ("symbol",)
+)
+
+# Connection pools
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds", "Time waiting for a connection from the SQLAlchemy pool", ("pool",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+)
+
+# Caches watched by watch_cache(): name -> TTLCache
+caches = {}
+
+
+def watch_cache(name: str, cache):
+    """Export the statistics of a TTLCache under `name`"""
+    caches[name] = cache
+    return cache
+
+
+def _cache_stats(field: str):
+    return lambda: {(name,): cache.stats()[field] for name, cache in list(caches.items())}
+
+
+def _cache_requests():
+    values = {}
+    for name, cache in list(caches.items()):
+        stats = cache.stats()
+        for result in ("hits", "misses", "coalesced"):
+            values[(name, result)] = stats[result]
+    return values
+
+
+Counter("cache_requests_total", "Cache lookups by result", ("cache", "result"), collect=_cache_requests)
+Counter("cache_evictions_total", "Entries evicted to respect the cache size", ("cache",),
+        collect=_cache_stats("evictions"))
+Gauge("cache_hit_ratio", "Share of lookups served from the cache or a shared load", ("cache",),
+      collect=_cache_stats("hit_ratio"))
+Gauge("cache_entries", "Entries currently cached", ("cache",), collect=_cache_stats("size"))
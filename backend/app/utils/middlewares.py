@@ -3,9 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from typing import Annotated
 from app.core.config import SECRET_KEY, ALGORITHM
 from app.models.user import User
-from app.services.user_service import get_by_id
+from app.schemas.user import UserClaims
+from app.services.user_service import get_principal_async
 
-async def authen_restricted(request: Request):
+def decode_bearer_token(request: Request) -> dict:
     autho = request.headers.get("authorization")
     if(not autho or not autho.startswith("Bearer ")):
         raise HTTPException(
@@ -16,21 +17,45 @@ async def authen_restricted(request: Request):
     token = autho.replace("Bearer ", "")
     try:
         decoded_token = jwt.decode(token, SECRET_KEY, ALGORITHM)
-        if not decoded_token:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Token invalid!"
-            )
-        print(f"Decode into {decoded_token}")
-        user = get_by_id(decoded_token["id"])
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Token invalid!"
-            )
-        request.state.user = user
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Error decoding token {e}"
-        )
\ No newline at end of file
+        )
+    if not decoded_token or "id" not in decoded_token:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Token invalid!"
+        )
+    return decoded_token
+
+async def authen_restricted(request: Request):
+    """
+    Authenticate the request and attach the up-to-date user to request.state.user.
+
+    The signature and expiry of the token are checked on every request; the
+    user itself comes from the principal cache, which is invalidated when
+    the user changes, so the database is only hit on a cache miss.
+    """
+    decoded_token = decode_bearer_token(request)
+    try:
+        user = await get_principal_async(decoded_token["id"])
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error decoding token {e}"
+        )
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Token invalid!"
+        )
+    request.state.user = user
+
+async def authen_claims(request: Request):
+    """
+    Authenticate the request from the token claims alone, without touching
+    the database. For routes that only need the user's id/email.
+    """
+    decoded_token = decode_bearer_token(request)
+    request.state.user = UserClaims(id=decoded_token["id"], email=decoded_token.get("email", ""))
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Callers reserve tokens up front and then wait for as long as the bucket
+    needs to refill, so concurrent callers are served in arrival order
+    instead of spinning on the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take `tokens` from the bucket and return how long to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block the calling thread until `tokens` are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1):
+        """Wait on the event loop until `tokens` are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def is_full(self) -> bool:
+        """True once the bucket has refilled, i.e. it is as good as a new one"""
+        with self._lock:
+            return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.capacity
+
+
+class RateLimiterRegistry:
+    """
+    Lazily creates one TokenBucket per key (e.g. per upstream source).
+
+    Buckets that have refilled are indistinguishable from new ones, so they
+    are dropped whenever the registry has doubled in size since the last
+    sweep; the registry stays proportional to the recently active keys.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None, sweep_size: int = 1024):
+        self.rate = rate
+        self.capacity = capacity
+        self.sweep_size = sweep_size
+        self._buckets = {}
+        self._next_sweep = sweep_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def get(self, key) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self._next_sweep:
+                    self._sweep()
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            return bucket
+
+    def _sweep(self):
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full()]:
+            del self._buckets[key]
+        self._next_sweep = max(self.sweep_size, 2 * len(self._buckets))
@@ -0,0 +1,87 @@
+import json
+import math
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from app.utils.candles import CandleSeries
+
+# Faster encoders/binary formats are used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CANDLE_FORMATS = ("records", "columns", "msgpack", "arrow")
+CANDLE_FORMAT_PATTERN = "^(" + "|".join(CANDLE_FORMATS) + ")$"
+
+
+def finite(value):
+    """`value` with NaN/Infinity floats replaced by None, as orjson encodes them"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite(item) for item in value]
+    return value
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(finite(content), separators=(",", ":"), allow_nan=False, default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSONResponse encoded with orjson when available"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def unavailable(format: str, package: str):
+    return HTTPException(
+        status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        detail=f"Format '{format}' needs the '{package}' package on the server"
+    )
+
+
+def candles_response(series: CandleSeries, format: str = "records", **extra) -> Response:
+    """
+    Serialize candles plus `extra` top-level fields in the requested format.
+
+    Formats:
+        records  {"data": [{"time": ..., "open": ...}, ...], ...extra}
+        columns  {"data": {"time": [...], "open": [...], ...}, ...extra}
+        msgpack  the columns layout as MessagePack, with "time" in epoch ns
+        arrow    an Arrow IPC stream of the candles, `extra` in the schema metadata
+    """
+    if format == "records":
+        return FastJSONResponse({"data": series.to_records(), **extra})
+    if format == "columns":
+        return FastJSONResponse({"data": series.to_columns(), **extra})
+    if format == "msgpack":
+        if msgpack is None:
+            raise unavailable(format, "msgpack")
+        columns = {name: col.tolist() for name, col in series.columns.items()}
+        return Response(msgpack.packb({"data": columns, **extra}), media_type="application/msgpack")
+    if format == "arrow":
+        if pa is None:
+            raise unavailable(format, "pyarrow")
+        arrays = {name: pa.array(col) for name, col in series.columns.items()}
+        arrays["time"] = pa.array(series["time"].view("datetime64[ns]"))
+        table = pa.table(arrays, metadata={"extra": dumps(extra)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), media_type="application/vnd.apache.arrow.stream")
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown format '{format}'")
@@ -0,0 +1,36 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from app.utils.candles import as_series
+
+
+def find_pivots(df, order=5):
+    """
+    Mark every pivot high and pivot low of a candle series in one pass.
+
+    Same rules as is_peak/is_trough: candle i is a peak when none of the
+    `order` candles on either side has a strictly higher high (a trough when
+    none has a strictly lower low), and the first/last `order` candles are
+    never pivots.
+
+    Returns:
+        Tuple of two boolean arrays (peaks, troughs), one entry per candle
+    """
+    series = as_series(df)
+    n = len(series)
+    peaks = np.zeros(n, dtype=bool)
+    troughs = np.zeros(n, dtype=bool)
+    width = 2 * order + 1
+    if n < width:
+        return peaks, troughs
+
+    highs = series['high']
+    lows = series['low']
+    # NaN neighbours never beat the current candle in the loop version,
+    # so push them to the far end of the comparison before taking max/min
+    window_max = sliding_window_view(np.where(np.isnan(highs), -np.inf, highs), width).max(axis=1)
+    window_min = sliding_window_view(np.where(np.isnan(lows), np.inf, lows), width).min(axis=1)
+
+    center = slice(order, n - order)
+    peaks[center] = ~(window_max > highs[center])
+    troughs[center] = ~(window_min < lows[center])
+    return peaks, troughs
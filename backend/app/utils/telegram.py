@@ -1,8 +1,227 @@
+import asyncio
+import logging
+import time
 import httpx
-from app.core.config import TELEGRAM_TOKEN
+from app.core.config import (
+    TELEGRAM_TOKEN, TELEGRAM_API_URL, TELEGRAM_WORKERS, TELEGRAM_QUEUE_SIZE,
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_MAX_RETRIES, TELEGRAM_STOP_TIMEOUT
+)
+from app.utils.rate_limit import TokenBucket, RateLimiterRegistry
+from app.utils.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+telegram_send_seconds = Histogram(
+    "telegram_send_seconds", "Duration of Telegram sendMessage calls", ("outcome",)
+)
+
+
+class TelegramSender:
+    """
+    Long-lived Telegram delivery service.
+
+    Messages are put on an asyncio queue and delivered by a fixed number of
+    worker tasks over one keep-alive HTTP client. Deliveries respect a
+    global and a per-chat rate limit and are retried with backoff on 429
+    (honouring retry_after), 5xx and transport errors.
+
+    A worker never sleeps on a single chat: a message whose chat is over
+    its rate, or that has to be retried later, is handed to a timer that
+    puts it back on the queue when it is due, and the worker moves on to
+    the next message.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.telegram.org",
+        workers: int = 8,
+        queue_size: int = 10000,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        max_retries: int = 5,
+        stop_timeout: float = 10,
+    ):
+        self.token = token
+        self.base_url = base_url
+        self.workers = workers
+        self.max_retries = max_retries
+        self.stop_timeout = stop_timeout
+        self.global_limiter = TokenBucket(global_rate)
+        self.chat_limiters = RateLimiterRegistry(rate=chat_rate, capacity=1)
+        self._queue_size = queue_size
+        self._queue = None
+        self._client = None
+        self._tasks = []
+        self._deferred = set()  # timers of messages waiting to be requeued
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def pending(self) -> int:
+        """Messages queued or waiting for their chat's rate limit / a retry"""
+        return (self._queue.qsize() if self._queue is not None else 0) + len(self._deferred)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers),
+        )
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self, drain: bool = True):
+        """
+        Stop the workers, by default after the pending messages are
+        delivered; messages still pending after `stop_timeout` seconds
+        are dropped.
+        """
+        if not self.running:
+            return
+        if drain:
+            try:
+                await asyncio.wait_for(self.join(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.pending} undelivered telegram messages on shutdown")
+        tasks = self._tasks + list(self._deferred)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._deferred.clear()
+        await self._client.aclose()
+        self._client = None
+
+    async def enqueue(self, chat_id: str, text: str):
+        """Queue a message for delivery, waiting if the queue is full"""
+        if not self.running:
+            await self.start()
+        await self._queue.put((chat_id, text, 0, False))
+
+    async def join(self):
+        """Wait until every queued or deferred message has been handled"""
+        while self.running:
+            await self._queue.join()
+            if not self._deferred:
+                return
+            await asyncio.wait(set(self._deferred))
+
+    def _defer(self, message: tuple, delay: float):
+        """Put `message` back on the queue in `delay` seconds"""
+        async def requeue():
+            await asyncio.sleep(delay)
+            await self._queue.put(message)
+
+        task = asyncio.create_task(requeue())
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def _work(self):
+        while True:
+            chat_id, text, attempt, reserved = await self._queue.get()
+            try:
+                await self.deliver(chat_id, text, attempt, reserved)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error sending telegram message to {chat_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def deliver(self, chat_id: str, text: str, attempt: int = 0, reserved: bool = False):
+        """
+        Make one delivery attempt, deferring the message instead when its
+        chat is over the rate limit or the attempt should be retried.
+
+        Args:
+            attempt: number of attempts already made
+            reserved: the chat's rate limit token was already taken
+        """
+        if not reserved:
+            # Reserving keeps the chat's messages in order; the message waits
+            # off the worker until its slot comes up
+            wait = self.chat_limiters.get(chat_id).reserve()
+            if wait > 0:
+                self._defer((chat_id, text, attempt, True), wait)
+                return
+        await self.global_limiter.acquire_async()
+        start = time.perf_counter()
+        try:
+            response = await self._client.post(
+                f"/bot{self.token}/sendMessage",
+                json={"chat_id": chat_id, "text": text}
+            )
+        except httpx.TransportError as e:
+            telegram_send_seconds.observe(time.perf_counter() - start, outcome="transport_error")
+            delay = self._backoff(attempt)
+            logger.warning(f"Telegram transport error for {chat_id}: {e}")
+        else:
+            telegram_send_seconds.observe(time.perf_counter() - start, outcome=str(response.status_code))
+            if response.status_code == 200:
+                self.sent += 1
+                return
+            if response.status_code == 429:
+                delay = self._retry_after(response, attempt)
+            elif response.status_code >= 500:
+                delay = self._backoff(attempt)
+            else:
+                self.failed += 1
+                logger.error(f"Telegram rejected message to {chat_id}: {response.status_code} {response.text}")
+                return
+        if attempt < self.max_retries:
+            self.retried += 1
+            self._defer((chat_id, text, attempt + 1, False), delay)
+            return
+        self.failed += 1
+        logger.error(f"Giving up sending telegram message to {chat_id} after {self.max_retries} retries")
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(30.0, 0.5 * 2 ** attempt)
+
+    def _retry_after(self, response: httpx.Response, attempt: int) -> float:
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except Exception:
+            pass
+        try:
+            return float(response.headers["Retry-After"])
+        except Exception:
+            return self._backoff(attempt)
+
+
+telegram_sender = TelegramSender(
+    token=TELEGRAM_TOKEN,
+    base_url=TELEGRAM_API_URL,
+    workers=TELEGRAM_WORKERS,
+    queue_size=TELEGRAM_QUEUE_SIZE,
+    global_rate=TELEGRAM_GLOBAL_RATE,
+    chat_rate=TELEGRAM_CHAT_RATE,
+    max_retries=TELEGRAM_MAX_RETRIES,
+    stop_timeout=TELEGRAM_STOP_TIMEOUT,
+)
+
+Counter(
+    "telegram_messages_total", "Telegram messages by delivery outcome", ("outcome",),
+    collect=lambda: {
+        ("sent",): telegram_sender.sent,
+        ("failed",): telegram_sender.failed,
+        ("retried",): telegram_sender.retried,
+    }
+)
+Gauge(
+    "telegram_queue_depth", "Messages waiting for delivery, queued or deferred",
+    collect=lambda: {(): telegram_sender.pending}
+)
+
 
 async def send_message(chat_id: str, text: str):
     print(f"sending {text} to {chat_id}")
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    async with httpx.AsyncClient() as client:
-        await client.post(url, json={"chat_id": chat_id, "text": text})
\ No newline at end of file
+    await telegram_sender.enqueue(chat_id, text)
@@ -1,28 +1,145 @@
 import asyncio
-from datetime import date
-from app.services.user_service import get_all_users
-from app.services.stock_api_service import is_divergence, get_price_today, get_mock_price
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app.services.subscription_service import subscriptions
+from app.services.stock_api_service import get_intraday, get_bars, with_indicators, closed_count
+from app.services.divergence_service import DivergenceSet
+from app.services.indicator_service import divergence_indicators
 from app.utils.telegram import send_message
+from app.utils.metrics import divergence_seconds, divergence_symbol_seconds, worker_tick_seconds, worker_tick_lag, worker_skipped_polls, worker_symbol_errors
+from app.utils.market_calendar import market_calendar
+from app.core.config import (
+    SUBSCRIPTION_REFRESH_SECONDS, WORKER_CONCURRENCY, WORKER_TIMEFRAMES,
+    WORKER_POLL_SECONDS, WORKER_POLL_DELAY, MARKET_HOURS_ONLY
+)
 from sqlalchemy.exc import OperationalError, DisconnectionError
 
+# Streaming detectors (one per indicator rule) per (symbol, timeframe), kept across ticks
+detectors: dict[tuple[str, str], DivergenceSet] = {}
+# Higher timeframes analysed on top of the 1m candles
+timeframes = [tf.strip() for tf in WORKER_TIMEFRAMES.split(",") if tf.strip()]
+
+# vnstock HTTP and pandas/talib block, so they run here
+# rather than on the event loop that also serves the API. The pool size
+# bounds how many symbols are processed at once.
+executor = ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY, thread_name_prefix="stock-worker")
+
+async def run_blocking(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+def detect(symbol: str, timeframe: str, candles, closed: int):
+    """
+    Feed the candles that closed since the last tick into the detectors of
+    (symbol, timeframe). The candles must carry the divergence_indicators
+    columns, see with_indicators.
+
+    Returns:
+        Tuple of (candles, new divergences)
+    """
+    detector = detectors.get((symbol, timeframe))
+    warm_up = detector is None or closed < detector.count
+    if warm_up:
+        detector = detectors[(symbol, timeframe)] = DivergenceSet()
+    with divergence_seconds.time(timeframe=timeframe), divergence_symbol_seconds.time(symbol=symbol):
+        if warm_up:
+            # First sight of the symbol or a new trading day: warm up silently
+            # so we don't alert on everything that already happened today
+            detector.update(candles[:closed])
+            return candles, []
+        events = detector.update(candles[detector.count:closed])
+    return candles, [{**event, "timeframe": timeframe} for event in events]
+
+def poll_symbol(symbol: str):
+    """
+    Fetch a symbol once and run divergence detection on the 1m candles and
+    on each higher timeframe built from them.
+
+    Returns:
+        List of (candles, divergence) pairs, the candles being the series of
+        the divergence's timeframe
+    """
+    raw, fetched_at = get_intraday(symbol)
+    alerts = []
+    for timeframe in ['1m'] + timeframes:
+        candles = raw if timeframe == '1m' else get_bars(symbol, timeframe, series=raw, fetched_at=fetched_at)
+        # RSI carries on from the previous days: nothing is trimmed, so the
+        # first bars of the day are analysed too
+        candles = with_indicators(symbol, timeframe, candles, divergence_indicators, trim=False)
+        # Only closed candles are final; the last one is too if it was fetched
+        # after its bar ended, so the bar the tick follows (or the session's
+        # last) is analysed now
+        candles, events = detect(symbol, timeframe, candles, closed_count(candles, fetched_at, timeframe))
+        alerts.extend((candles, event) for event in events)
+    return alerts
+
+def format_divergence(symbol: str, candles, divergence) -> str:
+    old = candles[divergence["prefixIndex"]]
+    new = candles[divergence["suffixIndex"]]
+    indicator = divergence.get("indicator", "RSI")
+    return (
+        f"Stock {symbol} has a {divergence['type']} {indicator} divergence on {divergence.get('timeframe', '1m')}: "
+        f"{old['time']} ({indicator} {old[indicator]:.2f}) -> {new['time']} ({indicator} {new[indicator]:.2f})"
+    )
+
+async def process_symbol(stock: str):
+    alerts = await run_blocking(poll_symbol, stock)
+    for candles, divergence in alerts:
+        msg = format_divergence(stock, candles, divergence)
+        for chat_id in subscriptions.chat_ids(stock):
+            await send_message(chat_id, msg)
+
+def next_tick(after: datetime) -> datetime:
+    """The first scheduled tick after `after`: just after a bar close in session"""
+    if not MARKET_HOURS_ONLY:
+        return after + timedelta(seconds=WORKER_POLL_SECONDS)
+    return market_calendar.next_poll(after, WORKER_POLL_SECONDS, WORKER_POLL_DELAY)
+
+def schedule_next_tick(previous: datetime) -> datetime:
+    """
+    The tick following the one scheduled at `previous`. When the last tick
+    overran, the latest poll already due runs right away (its lateness
+    shows in worker_tick_lag) and the earlier ones are counted as skipped.
+    """
+    now = market_calendar.now()
+    due = next_tick(previous)
+    following = next_tick(due)
+    while following <= now:
+        worker_skipped_polls.inc()
+        due, following = following, next_tick(following)
+    return due
+
+async def sleep_until_tick(planned: datetime):
+    """
+    Sleep until the tick scheduled at `planned`, then record how late it
+    starts compared to that schedule.
+    """
+    seconds = max((planned - market_calendar.now()).total_seconds(), 0.0)
+    if seconds > WORKER_POLL_SECONDS + WORKER_POLL_DELAY:
+        print(f"Market closed, stock worker sleeping until {planned:%Y-%m-%d %H:%M:%S}")
+    await asyncio.sleep(seconds)
+    worker_tick_lag.set(max((market_calendar.now() - planned).total_seconds(), 0.0))
+
 async def stock_worker():
+    planned = market_calendar.now()
+    if MARKET_HOURS_ONLY and not market_calendar.is_open():
+        # Started outside of market hours: nothing to warm up on until the next session
+        planned = next_tick(planned)
+        await sleep_until_tick(planned)
     while(True):
         try:
-            users = get_all_users()
-            for user in users:
-                if not user.chat_id or user.chat_id == "":
-                    continue
-                for stock in user.stocks:
-                    df = get_mock_price(stock)
-                    print(df)
-                    l = len(df)
-                    print("length is " + str(l))
-                    divergence = is_divergence(df, l - 1)
-                    # if divergence:
-                    #     print("Got the divergence " + str(divergence))
-                        # send_message(user.chat_id, f"Stock {stock} is a divergence: {divergence.suffixIndex} and {divergence.prefixIndex} at type {divergence.type}")
-            print("Hello World!")
-            await asyncio.sleep(5)
+            if subscriptions.is_stale(SUBSCRIPTION_REFRESH_SECONDS):
+                await subscriptions.load_async()
+            # Each symbol is fetched and analysed once, whatever its number of subscribers
+            symbols = subscriptions.symbols()
+            with worker_tick_seconds.time():
+                results = await asyncio.gather(*(process_symbol(stock) for stock in symbols), return_exceptions=True)
+            for stock, result in zip(symbols, results):
+                if isinstance(result, Exception):
+                    worker_symbol_errors.inc(symbol=stock)
+                    print(f"Error processing {stock} in stock_worker: {result}")
+            planned = schedule_next_tick(planned)
+            await sleep_until_tick(planned)
         except (OperationalError, DisconnectionError) as e:
             print(f"Database connection error in stock_worker: {e}")
             print("Retrying in 10 seconds...")
@@ -31,4 +148,4 @@ async def stock_worker():
         except Exception as e:
             print(f"Error in stock_worker: {str(e)}")
             await asyncio.sleep(5)
-            continue
\ No newline at end of file
+            continue
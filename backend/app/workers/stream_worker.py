@@ -0,0 +1,179 @@
+import asyncio
+from app.services.stock_api_service import get_intraday, get_candles, closed_count
+from app.services.divergence_service import DivergenceSet
+from app.services.indicator_service import divergence_indicators
+from app.workers.stock_worker import run_blocking
+from app.utils.metrics import divergence_seconds, divergence_symbol_seconds
+from app.utils.market_calendar import seconds_until_next_poll
+from app.core.config import STREAM_POLL_SECONDS, STREAM_QUEUE_SIZE
+
+
+class Subscriber:
+    """
+    One streaming client: a bounded queue of messages for all its symbols.
+
+    When the client reads slower than updates arrive, the oldest queued
+    message is dropped to make room and counted in `dropped`, so a slow
+    consumer can never make the pollers wait or grow memory.
+    """
+
+    def __init__(self, maxsize: int = STREAM_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.symbols = set()
+        self.dropped = 0
+
+    def push(self, message: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self) -> dict:
+        """Next message, preceded by a "lagged" notice if some were dropped"""
+        if self.dropped:
+            message = {"type": "lagged", "dropped": self.dropped}
+            self.dropped = 0
+            return message
+        return await self.queue.get()
+
+
+class SymbolFeed:
+    """Poller state shared by every subscriber of one symbol"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.subscribers = set()
+        self.detector = None
+        self.partial = None  # last forming candle pushed
+        self.latest = None  # (closed candles, forming candle) as last published
+        self.task = None
+
+    def snapshot(self) -> dict:
+        """Today's closed candles and the forming one, as last published"""
+        closed, partial = self.latest
+        return {
+            "type": "snapshot",
+            "symbol": self.symbol,
+            "closed": closed.to_columns(),
+            "partial": partial,
+        }
+
+    def poll(self) -> tuple[list[dict], tuple]:
+        """
+        Fetch the symbol and build the messages for what changed since the
+        last poll: newly closed candles, the forming candle and divergences.
+        On the first poll of the day the update is a full snapshot instead.
+
+        Returns:
+            Tuple of (messages, (closed candles, forming candle))
+        """
+        raw, fetched_at = get_intraday(self.symbol)
+        candles = get_candles(self.symbol, raw, divergence_indicators)
+        closed = closed_count(candles, fetched_at)
+        messages = []
+        warm_up = self.detector is None or closed < self.detector.count
+        if warm_up:
+            self.detector = DivergenceSet()
+        with divergence_seconds.time(timeframe='1m'), divergence_symbol_seconds.time(symbol=self.symbol):
+            if warm_up:
+                # First poll or a new trading day: only history, nothing new yet
+                self.detector.update(candles[:closed])
+                new = candles[closed:closed]
+                events = []
+            else:
+                new = candles[self.detector.count:closed]
+                events = self.detector.update(new)
+
+        partial = candles[closed] if closed < len(candles) else None
+        latest = (candles[:closed], partial)
+        if warm_up:
+            messages.append({"type": "snapshot", "symbol": self.symbol,
+                             "closed": latest[0].to_columns(), "partial": partial})
+            self.partial = partial
+        elif len(new) or partial != self.partial:
+            messages.append({
+                "type": "candles",
+                "symbol": self.symbol,
+                "closed": new.to_columns(),
+                "partial": partial,
+            })
+            self.partial = partial
+        for event in events:
+            messages.append({
+                "type": "divergence",
+                "symbol": self.symbol,
+                **event,
+                "prefixTime": candles[event["prefixIndex"]]["time"],
+                "suffixTime": candles[event["suffixIndex"]]["time"],
+            })
+        return messages, latest
+
+
+class StreamHub:
+    """
+    Fans live updates out to streaming clients.
+
+    Each symbol with at least one subscriber has exactly one polling task,
+    whatever the number of clients, and each poll only produces the
+    candles and divergences that are new since the previous one. Polls
+    follow the market calendar: a new feed is polled right away, further
+    polls only happen while the market is open. Every subscriber starts
+    with a "snapshot" message of the day so far, then gets the updates.
+    """
+
+    def __init__(self, interval: float = STREAM_POLL_SECONDS):
+        self.interval = interval
+        self.feeds: dict[str, SymbolFeed] = {}
+
+    def subscribe(self, subscriber: Subscriber, symbols):
+        for symbol in symbols:
+            if symbol in subscriber.symbols:
+                continue
+            feed = self.feeds.get(symbol)
+            if feed is None:
+                feed = self.feeds[symbol] = SymbolFeed(symbol)
+                feed.task = asyncio.create_task(self._run(feed))
+            feed.subscribers.add(subscriber)
+            subscriber.symbols.add(symbol)
+            if feed.latest is not None:
+                # Joining a running feed: start from its current state
+                subscriber.push(feed.snapshot())
+
+    def unsubscribe(self, subscriber: Subscriber, symbols=None):
+        for symbol in list(subscriber.symbols if symbols is None else symbols):
+            subscriber.symbols.discard(symbol)
+            feed = self.feeds.get(symbol)
+            if feed is None:
+                continue
+            feed.subscribers.discard(subscriber)
+            if not feed.subscribers:
+                # Last subscriber gone: stop polling the symbol
+                feed.task.cancel()
+                del self.feeds[symbol]
+
+    async def _run(self, feed: SymbolFeed):
+        while True:
+            try:
+                messages, latest = await run_blocking(feed.poll)
+                # Published on the loop, so a new subscriber's snapshot is
+                # always consistent with the updates that follow it
+                feed.latest = latest
+                for subscriber in list(feed.subscribers):
+                    for message in messages:
+                        subscriber.push(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error polling {feed.symbol} for streaming: {e}")
+            # Every `interval` seconds in session, then nothing until the next open
+            await asyncio.sleep(seconds_until_next_poll(self.interval))
+
+    async def stop(self):
+        tasks = [feed.task for feed in self.feeds.values()]
+        self.feeds.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+stream_hub = StreamHub()
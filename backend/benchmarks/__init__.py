@@ -0,0 +1,5 @@
+"""
+Benchmarks for the analysis and API hot paths.
+
+Run from backend/ with `python -m benchmarks.run`; see run.py.
+"""
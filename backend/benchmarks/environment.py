@@ -0,0 +1,89 @@
+"""
+Isolated environment for the benchmarks.
+
+setup() must run before anything from `app` is imported: it points the
+database, candle store and symbol snapshot at a temporary directory, keeps
+a developer's .env from overriding that, and replaces vnstock with an
+offline stub serving synthetic data.
+"""
+import os
+import sys
+import tempfile
+import types
+import pandas as pd
+from benchmarks.synthetic import generate_ohlcv, symbols
+
+workdir = None
+
+
+class Quote:
+    def __init__(self, symbol: str = "VGI", source: str = "VCI"):
+        self.symbol = symbol
+
+    def intraday(self, symbol: str = None, **kwargs):
+        return generate_ohlcv(symbol or self.symbol, days=1)
+
+    def history(self, symbol: str = None, **kwargs):
+        return generate_ohlcv(symbol or self.symbol, days=21)
+
+
+class Listing:
+    def all_symbols(self):
+        tickers = symbols(1500)
+        return pd.DataFrame({"symbol": tickers, "organ_name": [f"Company {t}" for t in tickers]})
+
+
+class Trading:
+    def __init__(self, symbol: str = None, source: str = "VCI"):
+        pass
+
+    def price_board(self, symbols_list):
+        return pd.DataFrame({"symbol": symbols_list, "match_price": [generate_ohlcv(s)["close"].iloc[-1] for s in symbols_list]})
+
+
+def setup():
+    global workdir
+    if workdir is not None:
+        return workdir
+    workdir = tempfile.mkdtemp(prefix="vnstock-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "SECRET_KEY": "benchmark",
+        "CANDLE_STORE_PATH": os.path.join(workdir, "candles"),
+        "SYMBOL_SNAPSHOT_PATH": os.path.join(workdir, "symbols.json"),
+        "PRINCIPAL_CACHE_TTL": "0",
+    })
+
+    # app.core.config calls load_dotenv(override=True), which would let a
+    # local .env point the benchmarks at a real database
+    import dotenv
+    dotenv.load_dotenv = lambda *args, **kwargs: False
+
+    stub = types.ModuleType("vnstock")
+    stub.Quote, stub.Listing, stub.Trading = Quote, Listing, Trading
+    sys.modules["vnstock"] = stub
+    return workdir
+
+
+def seed_users(users: int, stocks_per_user: int, stock_count: int = 200):
+    """Create the schema and a deterministic user base in the benchmark database"""
+    from sqlalchemy import insert
+    from app.db.database import Base, engine
+    from app.models.user import User
+    from app.models.stock import Stock
+    from app.models.user_stock import user_stock_association
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    tickers = symbols(stock_count)
+    with engine.begin() as conn:
+        conn.execute(insert(Stock), [{"id": i + 1, "symbol": s, "name": s, "summary": ""} for i, s in enumerate(tickers)])
+        conn.execute(insert(User), [
+            {"id": u + 1, "name": f"user{u}", "email": f"user{u}@example.com", "phone": "0900000000",
+             "password_hash": "x", "chat_id": str(100000 + u) if u % 2 else None}
+            for u in range(users)
+        ])
+        conn.execute(insert(user_stock_association), [
+            {"user_id": u + 1, "stock_id": (u * 7 + k * 13) % stock_count + 1}
+            for u in range(users) for k in range(stocks_per_user)
+        ])
@@ -0,0 +1,305 @@
+"""
+Benchmark suite for the analysis and API hot paths.
+
+    cd backend
+    python -m benchmarks.run                      # run and check scaling within the run
+    python -m benchmarks.run --only tim_phan_ky   # cases whose name contains a pattern
+    python -m benchmarks.run --update-baseline    # record this machine's numbers
+    python -m benchmarks.run --baseline benchmarks/baseline.json  # also compare with them
+
+Every case runs on deterministic synthetic data (see synthetic.py) against
+an offline vnstock stub and a seeded SQLite database (see environment.py).
+For each case the best of at least --repeat runs (and 0.3s of runs) gives
+the throughput, and one extra run under tracemalloc gives the peak memory.
+The exit status is 1 when a per-item cost grows with the input size (a
+quadratic scan crept in): both sides of that check come from the same run,
+so it holds on any machine. Absolute timings depend on the machine, so
+comparing with a recorded baseline is opt-in: record it with
+--update-baseline where the comparison runs, then pass --baseline to fail
+on cases slower or bigger than it beyond --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks import environment
+
+environment.setup()
+
+import numpy as np  # noqa: E402
+from benchmarks.synthetic import generate_ohlcv, symbols, TRADING_DAYS  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# (smaller case, larger case): the larger one may cost at most this much
+# more per item before it is reported as a scaling regression
+SCALING_LIMIT = 3.0
+SCALING_PAIRS = [
+    ("find_pivots/month", "find_pivots/year"),
+    ("tim_phan_ky/month", "tim_phan_ky/year"),
+    ("detector_stream/month", "detector_stream/year"),
+    ("bar_aggregator/month", "bar_aggregator/year"),
+    ("scan_divergences/month", "scan_divergences/year"),
+]
+
+CASES = {}
+
+
+def case(name: str):
+    """
+    Register a benchmark. The decorated function prepares its inputs and
+    returns (run, items): `run()` is the measured call and `items` the
+    number of candles/users/... it processes.
+    """
+    def decorator(func):
+        CASES[name] = func
+        return func
+    return decorator
+
+
+def candles(days: int, symbol: str = "VGI"):
+    from app.services.stock_api_service import with_rsi
+    from app.utils.candles import CandleSeries
+    return with_rsi(CandleSeries.from_frame(generate_ohlcv(symbol, days)))
+
+
+def sized(name: str, factory):
+    """Register `factory(days)` once per synthetic history size"""
+    for size, days in TRADING_DAYS.items():
+        case(f"{name}/{size}")(lambda days=days: factory(days))
+
+
+def bench_find_pivots(days):
+    from app.utils.stock_util import find_pivots
+    series = candles(days)
+    return lambda: find_pivots(series), len(series)
+
+
+def bench_tim_phan_ky(days):
+    from app.services.stock_api_service import tim_phan_ky
+    series = candles(days)
+    return lambda: tim_phan_ky(series), len(series)
+
+
+def bench_detector_stream(days):
+    from app.services.divergence_service import DivergenceDetector
+    series = candles(days)
+
+    def run():
+        detector = DivergenceDetector()
+        # A tick per 5 minutes worth of candles
+        for lo in range(0, len(series), 5):
+            detector.update(series[lo:lo + 5])
+    return run, len(series)
+
+
+def bench_bar_aggregator(days):
+    from app.utils.candles import BarAggregator
+    series = candles(days)
+
+    def run():
+        for timeframe in ("5m", "15m", "1h"):
+            aggregator = BarAggregator(timeframe)
+            for lo in range(0, len(series), 5):
+                aggregator.update(series[lo:lo + 5])
+            aggregator.bars()
+    return run, len(series)
+
+
+def bench_scan_divergences(days):
+    from app.services.candle_store import candle_store
+    from app.services.divergence_service import scan_divergences
+    from app.utils.candles import CandleSeries
+    symbol = f"SCAN{days}"
+    candle_store.append(symbol, "1m", CandleSeries.from_frame(generate_ohlcv(symbol, days)))
+    candle_store.compact(symbol, "1m")
+    return lambda: scan_divergences(symbol, io.StringIO(), chunk_size=20_000), days * len(generate_ohlcv(symbol, 1))
+
+
+sized("find_pivots", bench_find_pivots)
+sized("tim_phan_ky", bench_tim_phan_ky)
+sized("detector_stream", bench_detector_stream)
+sized("bar_aggregator", bench_bar_aggregator)
+sized("scan_divergences", bench_scan_divergences)
+
+
+@case("is_divergence/month")
+def bench_is_divergence():
+    from app.services.stock_api_service import is_divergence
+    from app.utils.stock_util import find_pivots
+    series = candles(TRADING_DAYS["month"])
+    pivots = find_pivots(series)
+    indexes = np.flatnonzero(pivots[0] | pivots[1]).tolist()
+    return lambda: [is_divergence(series, i, pivots) for i in indexes], len(indexes)
+
+
+@case("rsi_incremental/day")
+def bench_rsi_incremental():
+    from app.utils.indicators import RollingRSI
+    series = candles(1)
+    times, closes = series["time"], series["close"]
+
+    def run():
+        rsi = RollingRSI(14)
+        # One fetch per new candle over the day
+        for k in range(1, len(series) + 1):
+            rsi.compute(times[:k], closes[:k])
+    return run, len(series)
+
+
+@case("indicators/year")
+def bench_indicators():
+    from app.utils.indicators import INDICATORS
+    series = candles(TRADING_DAYS["year"])
+    return lambda: [indicator.compute(series) for indicator in INDICATORS.values()], len(series)
+
+
+@case("mock_price/day")
+def bench_mock_price():
+    from app.services.stock_api_service import get_mock_price
+    from app.services.candle_store import candle_store
+
+    def run():
+        series, divergences = get_mock_price("VGI")
+        return series.to_records(), divergences
+    # Fill the quote cache and archive the day's candles, so only the
+    # post-processing is measured and no run writes to the candle store
+    run()
+    candle_store.flush()
+    return run, len(generate_ohlcv("VGI", 1))
+
+
+def bench_simulate_trading(count: int):
+    from app.services.backtest_service import simulate_trading
+    tickers = symbols(count)
+    simulate_trading(tickers)  # fill the quote cache
+    return lambda: simulate_trading(tickers), count * len(generate_ohlcv("VGI", 1))
+
+
+def bench_backtest(count: int):
+    from app.services.backtest_service import run_backtest, divergence_signals
+    data = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for symbol in symbols(count):
+            series = candles(TRADING_DAYS["month"], symbol)
+            data[symbol] = (series["time"], series["close"], divergence_signals(series))
+    return lambda: run_backtest(data), sum(len(times) for times, _, _ in data.values())
+
+
+def bench_get_all_users(users: int):
+    from app.services.user_service import get_all_users
+    environment.seed_users(users, stocks_per_user=5)
+    return lambda: get_all_users(), users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="run the cases whose name contains this")
+    parser.add_argument("--symbols", type=int, default=10, help="symbols in the multi-symbol cases")
+    parser.add_argument("--users", type=int, default=5000, help="users in the seeded database")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative loss of throughput / growth of peak memory")
+    parser.add_argument("--baseline", help="compare with the results recorded in this file")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help=f"record the results in --baseline (default {os.path.relpath(BASELINE_PATH)})")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    case("simulate_trading/symbols")(lambda: bench_simulate_trading(args.symbols))
+    case("backtest/month-symbols")(lambda: bench_backtest(args.symbols))
+    case("get_all_users")(lambda: bench_get_all_users(args.users))
+
+    results = {}
+    for name, factory in CASES.items():
+        if args.only and args.only not in name:
+            continue
+        # The analysis code prints as it goes; discard it without buffering
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results[name] = measure(factory, args.repeat)
+        report(name, results[name])
+
+    failures = check_scaling(results)
+    if args.update_baseline:
+        path = args.baseline or BASELINE_PATH
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {path}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            failures += compare(results, json.load(f), args.tolerance)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+def measure(factory, repeat: int, min_seconds: float = 0.3) -> dict:
+    run, items = factory()
+    run()  # warm-up
+    best = float("inf")
+    runs, spent = 0, 0.0
+    # Best of at least `repeat` runs and `min_seconds` of runs, so short
+    # cases are not judged on a single noisy sample
+    while runs < repeat or spent < min_seconds:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        runs += 1
+        spent += elapsed
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "items": items,
+        "seconds": best,
+        "throughput": items / best if best else float("inf"),
+        "peak_kb": peak / 1024,
+    }
+
+
+def report(name: str, result: dict):
+    print(
+        f"{name:<32} {result['items']:>9} items {result['seconds'] * 1000:>10.2f} ms "
+        f"{result['throughput']:>14,.0f} items/s {result['peak_kb']:>10,.0f} KiB peak"
+    )
+
+
+def check_scaling(results: dict) -> list[str]:
+    failures = []
+    for small, large in SCALING_PAIRS:
+        if small in results and large in results:
+            ratio = results[small]["throughput"] / results[large]["throughput"]
+            if ratio > SCALING_LIMIT:
+                failures.append(f"{large}: {ratio:.1f}x slower per item than {small}")
+    return failures
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None or expected["items"] != result["items"]:
+            continue
+        if result["throughput"] < expected["throughput"] * (1 - tolerance):
+            failures.append(
+                f"{name}: {result['throughput']:,.0f} items/s, baseline {expected['throughput']:,.0f}"
+            )
+        # Small absolute slack so tiny cases don't flap on allocator noise
+        if result["peak_kb"] > expected["peak_kb"] * (1 + tolerance) + 256:
+            failures.append(f"{name}: {result['peak_kb']:,.0f} KiB peak, baseline {expected['peak_kb']:,.0f}")
+    return failures
+
+
+if __name__ == "__main__":
+    main()
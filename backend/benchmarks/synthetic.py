@@ -0,0 +1,61 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+# Minutes of the HOSE continuous sessions: 09:15-11:30 and 13:00-14:45
+SESSION_MINUTES = np.concatenate([
+    np.arange(9 * 60 + 15, 11 * 60 + 30),
+    np.arange(13 * 60, 14 * 60 + 45),
+])
+BARS_PER_DAY = len(SESSION_MINUTES)
+TRADING_DAYS = {"day": 1, "month": 21, "year": 250}
+
+
+def symbol_seed(symbol: str, seed: int = 0) -> int:
+    """Stable per-symbol seed (str hash() is salted per process)"""
+    return zlib.crc32(symbol.encode()) ^ seed
+
+
+def generate_ohlcv(symbol: str = "VGI", days: int = 1, end: str = "2026-10-16", seed: int = 0) -> pd.DataFrame:
+    """
+    Deterministic 1-minute OHLCV bars for `days` trading days ending on `end`,
+    shaped like vnstock's intraday frame (time, open, high, low, close, volume).
+
+    Prices follow a random walk in thousands of VND rounded to the 0.05 tick,
+    so there are ties and ranges like real quotes.
+    """
+    rng = np.random.default_rng(symbol_seed(symbol, seed))
+    dates = pd.bdate_range(end=end, periods=days)
+    times = (
+        dates.values.astype("datetime64[m]")[:, None]
+        + SESSION_MINUTES.astype("timedelta64[m]")[None, :]
+    ).ravel().astype("datetime64[ns]")
+    n = len(times)
+
+    start = rng.uniform(10, 100)
+    close = start * np.exp(np.cumsum(rng.normal(0, 0.0015, n)))
+    open = np.concatenate([[start], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, n)) * close
+    high = np.maximum(open, close) + spread
+    low = np.minimum(open, close) - spread
+
+    def tick(values):
+        return np.round(values / 0.05) * 0.05
+
+    return pd.DataFrame({
+        "time": times,
+        "open": tick(open),
+        "high": tick(high),
+        "low": tick(low),
+        "close": tick(close),
+        "volume": rng.lognormal(7, 1, n).astype(np.int64) * 10,
+    })
+
+
+def symbols(count: int) -> list[str]:
+    """`count` distinct three-letter tickers"""
+    letters = "ABCDEFGHIKLMNOPQRSTVX"
+    return [
+        letters[i // len(letters) ** 2 % len(letters)] + letters[i // len(letters) % len(letters)] + letters[i % len(letters)]
+        for i in range(count)
+    ]